@@ -1,13 +1,19 @@
 """Manifold Markets API client."""
 
+import hashlib
+import json
 import os
-import requests
+import time
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
 
 from dotenv import load_dotenv
 
-from .config import MANIFOLD_API_BASE
+from .config import (
+    MANIFOLD_API_BASE, REQUEST_TIMEOUT, CONNECT_TIMEOUT, CACHE_DIR, CACHE_MAX_STALENESS, BETS_PAGE_SIZE,
+)
+from .transport import LatencyHistogram, make_session
+from .parsing import parse_bucket_boundaries, parse_many  # noqa: F401 (re-exported)
 
 
 def load_api_key() -> str:
@@ -22,31 +28,145 @@ def load_api_key() -> str:
     raise ValueError("MANIFOLD_API_KEY not found in .env file or environment")
 
 
+class ResponseCache:
+    """Persistent on-disk cache of GET responses, keyed by URL.
+
+    Entries younger than `max_staleness` seconds are served without touching
+    the network. Older entries are revalidated with If-None-Match /
+    If-Modified-Since, so an unchanged resource costs a 304 instead of a full
+    payload.
+    """
+
+    def __init__(self, cache_dir: Path = CACHE_DIR, max_staleness: float = CACHE_MAX_STALENESS):
+        self.cache_dir = Path(cache_dir)
+        self.max_staleness = max_staleness
+
+    def _path(self, url: str) -> Path:
+        return self.cache_dir / f"{hashlib.sha1(url.encode()).hexdigest()}.json"
+
+    def load(self, url: str) -> dict[str, Any] | None:
+        """Load the cache entry for a URL, or None if missing/corrupt."""
+        try:
+            with open(self._path(url)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get("url") == url else None
+
+    def store(self, url: str, body: Any, etag: str | None = None, last_modified: str | None = None):
+        """Write an entry atomically (safe with concurrent fetches)."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(url)
+        tmp = path.with_suffix(f".{os.getpid()}.{time.monotonic_ns()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump({
+                "url": url,
+                "fetched_at": time.time(),
+                "etag": etag,
+                "last_modified": last_modified,
+                "body": body,
+            }, f)
+        os.replace(tmp, path)
+
+    def is_fresh(self, entry: dict[str, Any]) -> bool:
+        """Whether an entry can be served without revalidation."""
+        return time.time() - entry["fetched_at"] <= self.max_staleness
+
+
 class ManifoldClient:
-    """Client for Manifold Markets API."""
+    """Client for Manifold Markets API.
+
+    Requests share one pooled keep-alive session (see transport.make_session),
+    every call has a connect and read timeout, and per-endpoint latency is
+    recorded in `self.latency`.
+    """
 
-    def __init__(self, api_key: str | None = None):
+    def __init__(
+        self,
+        api_key: str | None = None,
+        cache: ResponseCache | None = None,
+        base_url: str = MANIFOLD_API_BASE,
+    ):
         self.api_key = api_key or load_api_key()
-        self.session = requests.Session()
+        self.base_url = base_url.rstrip("/")
+        self.cache = cache
+        self.latency = LatencyHistogram()
+        self.session = make_session()
         self.session.headers.update({
             "Authorization": f"Key {self.api_key}",
             "Content-Type": "application/json",
         })
 
-    def get_market(self, market_id: str) -> dict[str, Any]:
+    def _request(self, method: str, endpoint: str, url: str, timeout: float = REQUEST_TIMEOUT, **kwargs):
+        """Send a request with connect/read timeouts, recording its latency under `endpoint`."""
+        start = time.perf_counter()
+        error = True
+        try:
+            resp = self.session.request(method, url, timeout=(CONNECT_TIMEOUT, timeout), **kwargs)
+            error = resp.status_code >= 400
+            return resp
+        finally:
+            self.latency.record(endpoint, time.perf_counter() - start, error)
+
+    def _get_cached(self, endpoint: str, url: str, timeout: float = REQUEST_TIMEOUT) -> Any:
+        """GET a JSON resource through the response cache, if one is configured."""
+        if self.cache is None:
+            resp = self._request("GET", endpoint, url, timeout=timeout)
+            resp.raise_for_status()
+            return resp.json()
+
+        entry = self.cache.load(url)
+        if entry is not None and self.cache.is_fresh(entry):
+            return entry["body"]
+
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        resp = self._request("GET", endpoint, url, timeout=timeout, headers=headers)
+        if resp.status_code == 304 and entry is not None:
+            body = entry["body"]
+        else:
+            resp.raise_for_status()
+            body = resp.json()
+        self.cache.store(
+            url, body,
+            etag=resp.headers.get("ETag") or (entry or {}).get("etag"),
+            last_modified=resp.headers.get("Last-Modified") or (entry or {}).get("last_modified"),
+        )
+        return body
+
+    def get_market(self, market_id: str, timeout: float = REQUEST_TIMEOUT) -> dict[str, Any]:
         """Fetch market data by ID.
 
         Returns the full market object including answers for multiple choice.
         """
-        url = f"{MANIFOLD_API_BASE}/market/{market_id}"
-        resp = self.session.get(url)
+        url = f"{self.base_url}/market/{market_id}"
+        return self._get_cached("GET /market", url, timeout=timeout)
+
+    def get_me(self, timeout: float = REQUEST_TIMEOUT) -> dict[str, Any]:
+        """The authenticated user."""
+        resp = self._request("GET", "GET /me", f"{self.base_url}/me", timeout=timeout)
         resp.raise_for_status()
         return resp.json()
 
-    def get_market_positions(self, market_id: str) -> list[dict[str, Any]]:
-        """Get current positions in a market."""
-        url = f"{MANIFOLD_API_BASE}/market/{market_id}/positions"
-        resp = self.session.get(url)
+    def get_market_positions(
+        self,
+        market_id: str,
+        user_id: str | None = None,
+        timeout: float = REQUEST_TIMEOUT,
+    ) -> list[dict[str, Any]]:
+        """Get current positions in a market, optionally for one user.
+
+        Never served from the response cache: positions change with every
+        bet we place.
+        """
+        url = f"{self.base_url}/market/{market_id}/positions"
+        params = {"userId": user_id} if user_id else {}
+        resp = self._request("GET", "GET /market/positions", url, timeout=timeout, params=params)
         resp.raise_for_status()
         return resp.json()
 
@@ -56,6 +176,7 @@ class ManifoldClient:
         answer_id: str,
         amount: float,
         outcome: str = "YES",
+        timeout: float = REQUEST_TIMEOUT,
     ) -> dict[str, Any]:
         """Place a bet on a multiple choice market.
 
@@ -64,136 +185,70 @@ class ManifoldClient:
             answer_id: The answer ID to bet on
             amount: Amount in mana to bet
             outcome: "YES" to buy shares, "NO" to sell
+            timeout: Seconds to wait for the server
 
         Returns:
             Bet confirmation response
         """
-        url = f"{MANIFOLD_API_BASE}/bet"
+        url = f"{self.base_url}/bet"
         payload = {
             "contractId": market_id,
             "answerId": answer_id,
             "amount": int(amount),
             "outcome": outcome,
         }
-        resp = self.session.post(url, json=payload)
+        resp = self._request("POST", "POST /bet", url, timeout=timeout, json=payload)
         resp.raise_for_status()
         return resp.json()
 
-    def get_my_bets(self, market_id: str | None = None) -> list[dict[str, Any]]:
-        """Get my bets, optionally filtered by market."""
-        url = f"{MANIFOLD_API_BASE}/bets"
-        params = {}
+    def iter_my_bets(
+        self,
+        market_id: str | None = None,
+        since_id: str | None = None,
+        user_id: str | None = None,
+        page_size: int = BETS_PAGE_SIZE,
+        prefetch: bool = True,
+        timeout: float = REQUEST_TIMEOUT,
+    ) -> Iterator[dict[str, Any]]:
+        """Stream my bets newest first, one /bets page per request.
+
+        Pages are requested lazily with a `before` cursor; with prefetch, the
+        next page is fetched on a background thread while the caller works
+        through the current one. With since_id, streaming stops at that bet,
+        so an incremental sync only requests pages of newer bets.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        url = f"{self.base_url}/bets"
+        params: dict[str, Any] = {"userId": user_id or self.get_me()["id"], "limit": page_size}
         if market_id:
             params["contractId"] = market_id
-        resp = self.session.get(url, params=params)
-        resp.raise_for_status()
-        return resp.json()
-
-
-def parse_bucket_boundaries(answer_text: str, market_key: str) -> tuple[float | None, float | None]:
-    """Parse bucket boundaries from answer text.
-
-    Handles various formats:
-    - "1-2 months" -> (1, 2)
-    - "≥7 months" -> (7, inf)
-    - "<3 months" -> (-inf, 3)
-    - "35%-50%" -> (35, 50)
-    - "$35B-$60B" -> (35, 60)
-    - etc.
-
-    Returns (lower, upper) bounds. None means unbounded.
-    """
-    import re
-
-    text = answer_text.strip()
-
-    # Handle percentage-point changes (YouGov sentiment)
-    if "pp" in text.lower() or "percentage point" in text.lower():
-        # Examples: "-30 to -20pp", "≥+10pp", "<-30pp"
-        # Range pattern: "-30 to -20pp" or "-30 to -20 pp"
-        range_match = re.search(r'([+-]?\d+(?:\.\d+)?)\s*(?:to|-)\s*([+-]?\d+(?:\.\d+)?)\s*pp', text, re.IGNORECASE)
-        if range_match:
-            val1 = float(range_match.group(1))
-            val2 = float(range_match.group(2))
-            return (val1, val2)
-
-        # Boundary pattern: "<-30pp", "≥+10pp"
-        boundary_match = re.search(r'([<>≤≥])\s*([+-]?\d+(?:\.\d+)?)\s*pp', text, re.IGNORECASE)
-        if boundary_match:
-            prefix, val = boundary_match.groups()
-            val = float(val)
-            if prefix in ['<', '≤']:
-                return (None, val)
-            elif prefix in ['>', '≥']:
-                return (val, None)
-
-    # Handle multipliers (METR uplift)
-    if 'x' in text.lower():
-        match = re.search(r'([<>≤≥]?)\s*(\d+(?:\.\d+)?)\s*x?\s*(?:to|-)?\s*(\d+(?:\.\d+)?)?\s*x?', text, re.IGNORECASE)
-        if match:
-            prefix, val1, val2 = match.groups()
-            val1 = float(val1)
-            if val2:
-                val2 = float(val2)
-                return (val1, val2)
-            elif prefix in ['<', '≤']:
-                return (None, val1)
-            elif prefix in ['>', '≥']:
-                return (val1, None)
-
-    # Handle dollar amounts
-    if '$' in text:
-        match = re.search(r'\$?(\d+(?:\.\d+)?)\s*B?\s*(?:to|-)?\s*\$?(\d+(?:\.\d+)?)?', text)
-        if match:
-            val1 = float(match.group(1))
-            val2 = float(match.group(2)) if match.group(2) else None
-            if val2:
-                return (val1, val2)
-            # Check for ≥ or <
-            if '≥' in text or '>' in text:
-                return (val1, None)
-            elif '<' in text or '≤' in text:
-                return (None, val1)
-
-    # Handle percentages
-    if '%' in text:
-        match = re.search(r'([<>≤≥]?)\s*(\d+(?:\.\d+)?)\s*%?\s*(?:to|-)?\s*(\d+(?:\.\d+)?)?\s*%?', text)
-        if match:
-            prefix, val1, val2 = match.groups()
-            val1 = float(val1)
-            if val2:
-                val2 = float(val2)
-                return (val1, val2)
-            elif prefix in ['<', '≤']:
-                return (None, val1)
-            elif prefix in ['>', '≥']:
-                return (val1, None)
-
-    # Handle months
-    if 'month' in text.lower():
-        match = re.search(r'([<>≤≥]?)\s*(\d+(?:\.\d+)?)\s*(?:to|-)?\s*(\d+(?:\.\d+)?)?\s*month', text, re.IGNORECASE)
-        if match:
-            prefix, val1, val2 = match.groups()
-            val1 = float(val1)
-            if val2:
-                val2 = float(val2)
-                return (val1, val2)
-            elif prefix in ['<', '≤']:
-                return (None, val1)
-            elif prefix in ['>', '≥']:
-                return (val1, None)
-
-    # Handle plain numbers (e.g., Epoch capabilities index)
-    match = re.search(r'([<>≤≥]?)\s*(\d+(?:\.\d+)?)\s*(?:to|-)?\s*(\d+(?:\.\d+)?)?', text)
-    if match:
-        prefix, val1, val2 = match.groups()
-        val1 = float(val1)
-        if val2:
-            val2 = float(val2)
-            return (val1, val2)
-        elif prefix in ['<', '≤']:
-            return (None, val1)
-        elif prefix in ['>', '≥']:
-            return (val1, None)
-
-    return (None, None)
+        if since_id:
+            params["after"] = since_id
+
+        def fetch(before: str | None) -> list[dict[str, Any]]:
+            resp = self._request("GET", "GET /bets", url, timeout=timeout,
+                                 params={**params, "before": before} if before else params)
+            resp.raise_for_status()
+            return resp.json()
+
+        pool = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        try:
+            page = fetch(None)
+            while page:
+                cursor = page[-1]["id"] if len(page) >= page_size else None
+                pending = pool.submit(fetch, cursor) if pool and cursor else None
+                for bet in page:
+                    if bet["id"] == since_id:
+                        return
+                    yield bet
+                if cursor is None:
+                    return
+                page = pending.result() if pending else fetch(cursor)
+        finally:
+            if pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    def get_my_bets(self, market_id: str | None = None, timeout: float = REQUEST_TIMEOUT) -> list[dict[str, Any]]:
+        """Get all my bets, optionally filtered by market (see iter_my_bets)."""
+        return list(self.iter_my_bets(market_id, timeout=timeout))
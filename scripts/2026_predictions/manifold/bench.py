@@ -0,0 +1,323 @@
+"""Offline benchmarks for the betting loop.
+
+By default, generates synthetic markets and predictions, runs run_dry_run and
+execute_bets against manifold.fake_server, and reports throughput and
+per-endpoint request latency percentiles. --distributions instead times scalar
+cdf/pdf/ppf calls against the equivalent scipy.stats frozen distributions
+(and batched bucket probabilities per family, metalog included),
+--sizing times batched Kelly sizing against the per-market loop,
+--joint compares joint multi-outcome Kelly against the greedy per-bucket sizer,
+and --startup checks that `manifold.main --help` stays fast and loads no heavy
+dependencies.
+
+Usage:
+    python -m manifold.bench --markets 300 --buckets 8 --latency-ms 40 --jitter-ms 80
+    python -m manifold.bench --distributions
+    python -m manifold.bench --sizing --markets 5000
+    python -m manifold.bench --joint --markets 10 --buckets 12
+    python -m manifold.bench --startup
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+from .api import ManifoldClient
+from .distributions import compute_bucket_probs, fit_distribution, fit_distribution_batch
+from .joint_kelly import expected_log_growth, size_bets_joint
+from .kelly import calculate_bets_for_market, size_bets_batch
+from .config import BET_RATE_PER_SEC
+from .fake_server import FakeManifold, serve
+from .ledger import Ledger
+from .main import run_dry_run, execute_bets
+from .predictions import Prediction
+
+
+def synthetic_markets(
+    fake: FakeManifold,
+    n_markets: int,
+    n_buckets: int,
+    seed: int = 0,
+) -> tuple[dict[str, Prediction], dict[str, str]]:
+    """Add n_markets random numeric markets to the fake server.
+
+    Returns (predictions, market_ids) suitable for run_dry_run.
+    """
+    rng = random.Random(seed)
+    predictions = {}
+    market_ids = {}
+    for i in range(n_markets):
+        key = f"synthetic_{i:04d}"
+        market_id = f"fake{i:06d}"
+        median = rng.uniform(20, 80)
+        spread = rng.uniform(5, 20)
+        predictions[key] = Prediction(
+            key=key,
+            name=f"Synthetic market {i}",
+            median=median,
+            p10=median - spread,
+            p90=median + spread,
+            dist_type="normal",
+            unit="index",
+        )
+
+        edges = np.linspace(median - 2 * spread, median + 2 * spread, n_buckets - 1).round(1)
+        texts = [f"<{edges[0]}"]
+        texts += [f"{lo}-{hi}" for lo, hi in zip(edges[:-1], edges[1:])]
+        texts += [f"≥{edges[-1]}"]
+        # Market prices: noisy and shifted relative to our forecast
+        probs = np.array([rng.random() + 0.1 for _ in texts])
+        fake.add_market(market_id, [
+            (f"{market_id}a{j}", text, p) for j, (text, p) in enumerate(zip(texts, probs / probs.sum()))
+        ])
+        market_ids[key] = market_id
+    return predictions, market_ids
+
+
+def bench_distributions(number: int = 20_000):
+    """Time per-call cdf/pdf/ppf against scipy.stats frozen distributions."""
+    from scipy import stats
+
+    cases = {
+        "normal": fit_distribution(4.5, 3.0, 6.5, "normal"),
+        "lognormal": fit_distribution(18, 8, 35, "lognormal"),
+        "truncated_normal": fit_distribution(74, 45, 95, "truncated_normal", 0, 100),
+    }
+    for name, dist in cases.items():
+        p = dist.params
+        if name == "normal":
+            ref = stats.norm(loc=p["mean"], scale=p["sigma"])
+        elif name == "lognormal":
+            ref = stats.lognorm(s=p["sigma"], scale=np.exp(p["mu"]))
+        else:
+            ref = stats.truncnorm(
+                a=(p["lower_bound"] - p["mean"]) / p["sigma"],
+                b=(p["upper_bound"] - p["mean"]) / p["sigma"],
+                loc=p["mean"], scale=p["sigma"],
+            )
+        x = dist.ppf(0.3)
+        assert abs(dist.cdf(x) - float(ref.cdf(x))) < 1e-9
+        for method, arg in (("cdf", x), ("pdf", x), ("ppf", 0.3)):
+            ours = getattr(dist, method)
+            theirs = getattr(ref, method)
+            t_ours = timeit.timeit(lambda: ours(arg), number=number) / number
+            t_ref = timeit.timeit(lambda: float(theirs(arg)), number=number) / number
+            print(f"{name:<17} {method}: {t_ours * 1e6:6.2f}us vs scipy {t_ref * 1e6:6.2f}us "
+                  f"({t_ref / t_ours:.0f}x)")
+
+    # Batched bucket probabilities, including the metalog's iterative cdf
+    rng = np.random.default_rng(0)
+    medians = rng.uniform(10, 30, 5000)
+    buckets = [(None, 5), (5, 10), (10, 20), (20, 40), (40, None)]
+    for name in ("normal", "lognormal", "metalog"):
+        dist = fit_distribution_batch(medians, medians / 2, medians * 2, name)
+        t = timeit.timeit(lambda: compute_bucket_probs(dist, buckets), number=10) / 10
+        print(f"{name:<17} compute_bucket_probs x{len(medians)}: {t * 1000:6.2f}ms")
+
+    # Inverse direction: implied distributions from every market's bucket prices
+    from .implied import fit_implied
+
+    markets = [(buckets, p) for p in rng.dirichlet(np.full(len(buckets), 3.0), size=len(medians))]
+    for name in ("normal", "lognormal", "metalog"):
+        t = timeit.timeit(lambda: fit_implied(markets, name), number=3) / 3
+        print(f"{name:<17} fit_implied x{len(markets)}: {t * 1000:6.2f}ms")
+
+
+def bench_sizing(n_markets: int, n_buckets: int, seed: int = 0):
+    """Time size_bets_batch against calling calculate_bets_for_market per market."""
+    rng = np.random.default_rng(seed)
+    our_probs = list(rng.dirichlet(np.ones(n_buckets), size=n_markets))
+    market_probs = list(rng.dirichlet(np.ones(n_buckets), size=n_markets))
+    allocations = rng.uniform(100, 5000, size=n_markets)
+    ids = [str(i) for i in range(n_buckets)]
+
+    start = time.perf_counter()
+    looped = sum(
+        len(calculate_bets_for_market(ids, ids, o, m, a))
+        for o, m, a in zip(our_probs, market_probs, allocations)
+    )
+    t_loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = len(size_bets_batch(our_probs, market_probs, allocations))
+    t_batch = time.perf_counter() - start
+
+    assert looped == batched
+    print(f"Sizing {n_markets} markets x {n_buckets} buckets ({batched} bets)")
+    print(f"  per-market loop: {t_loop * 1000:8.1f}ms ({n_markets / t_loop:,.0f} markets/s)")
+    print(f"  batched:         {t_batch * 1000:8.1f}ms ({n_markets / t_batch:,.0f} markets/s)")
+
+
+def bench_joint(n_markets: int, n_buckets: int, seed: int = 0):
+    """Compare joint and greedy sizing: solve time and expected log growth.
+
+    Market prices are our probabilities plus noise, so edges are of the size
+    seen in practice. Growth is per unit of each market's allocation, summed
+    over markets; at full Kelly without caps the joint solution is optimal by
+    construction, so the greedy shortfall there measures its mis-sizing.
+    """
+    rng = np.random.default_rng(seed)
+    our_probs = list(rng.dirichlet(np.full(n_buckets, 3.0), size=n_markets))
+    market_probs = [
+        rng.dirichlet(np.maximum(o * 30 + rng.normal(0, 1, n_buckets), 0.1)) for o in our_probs
+    ]
+    allocations = np.full(n_markets, 1000.0)
+
+    def growth(rows):
+        total = 0.0
+        for m in range(n_markets):
+            yes, no = np.zeros(n_buckets), np.zeros(n_buckets)
+            for row in rows[rows["market"] == m]:
+                side = yes if row["outcome"] == "YES" else no
+                side[row["bucket"]] = row["bet_amount"] / allocations[m]
+            total += expected_log_growth(our_probs[m], market_probs[m], yes, no)
+        return total
+
+    print(f"Joint vs greedy Kelly, {n_markets} markets x {n_buckets} buckets")
+    for label, kwargs in (
+        ("configured", {}),
+        ("full Kelly, no caps", dict(kelly_mult=1.0, edge_threshold=0.0, max_position_pct=10.0, min_bet=0.0)),
+    ):
+        start = time.perf_counter()
+        greedy = size_bets_batch(our_probs, market_probs, allocations, **kwargs)
+        t_greedy = time.perf_counter() - start
+        start = time.perf_counter()
+        joint = size_bets_joint(our_probs, market_probs, allocations, **kwargs)
+        t_joint = time.perf_counter() - start
+        print(f"  {label}:")
+        print(f"    greedy: {len(greedy):3d} bets, stake {greedy['bet_amount'].sum():8.0f}, "
+              f"E[log growth] {growth(greedy):+.4f}, {t_greedy * 1000:.1f}ms")
+        print(f"    joint:  {len(joint):3d} bets, stake {joint['bet_amount'].sum():8.0f}, "
+              f"E[log growth] {growth(joint):+.4f}, {t_joint * 1000:.1f}ms")
+
+
+STARTUP_BUDGET_MS = 100.0
+HEAVY_MODULES = ("numpy", "scipy", "requests", "urllib3", "dotenv")
+
+
+def bench_startup(runs: int = 10) -> bool:
+    """Time `python -m manifold.main --help` and check it imports nothing heavy.
+
+    Runs the CLI in fresh interpreters under -X importtime. Returns False if
+    the best run exceeds STARTUP_BUDGET_MS or a HEAVY_MODULES package loads.
+    """
+    cwd = Path(__file__).parent.parent
+    cmd = [sys.executable, "-X", "importtime", "-m", "manifold.main", "--help"]
+
+    def best_of(argv):
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            proc = subprocess.run(argv, cwd=cwd, capture_output=True, text=True, check=True)
+            times.append(time.perf_counter() - start)
+        return min(times) * 1000, proc.stderr
+
+    baseline_ms, _ = best_of([sys.executable, "-c", "pass"])
+    help_ms, importtime = best_of(cmd)
+
+    # "import time: self [us] | cumulative | name", nesting shown by indentation
+    imported = {}
+    for line in importtime.splitlines()[1:]:
+        _, cumulative, name = line.split("|")
+        imported[name.strip()] = int(cumulative) / 1000
+    heavy = sorted({n.split(".")[0] for n in imported} & set(HEAVY_MODULES))
+    ours = sorted(((ms, n) for n, ms in imported.items() if n.startswith("manifold")), reverse=True)
+
+    print(f"python -c pass:   {baseline_ms:6.1f}ms")
+    print(f"manifold --help:  {help_ms:6.1f}ms (budget {STARTUP_BUDGET_MS:.0f}ms)")
+    for ms, name in ours[:5]:
+        print(f"  {name:<24} {ms:6.1f}ms cumulative import")
+    ok = help_ms <= STARTUP_BUDGET_MS and not heavy
+    if heavy:
+        print(f"FAIL: --help imported {', '.join(heavy)}")
+    elif not ok:
+        print("FAIL: --help is over budget")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the betting loop against a fake Manifold API")
+    parser.add_argument("--markets", type=int, default=200)
+    parser.add_argument("--buckets", type=int, default=8)
+    parser.add_argument("--bankroll", type=float, default=100_000)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--bet-rate", type=float, default=BET_RATE_PER_SEC,
+                        help="Token bucket rate for bet placement (the fake server has no rate limit)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--distributions", action="store_true",
+                        help="Micro-benchmark distribution calls instead of the betting loop")
+    parser.add_argument("--sizing", action="store_true",
+                        help="Micro-benchmark batched Kelly sizing instead of the betting loop")
+    parser.add_argument("--joint", action="store_true",
+                        help="Compare joint and greedy Kelly sizing instead of running the betting loop")
+    parser.add_argument("--startup", action="store_true",
+                        help="Check CLI startup time and lazy imports (exits 1 on failure)")
+    args = parser.parse_args()
+
+    if args.startup:
+        sys.exit(0 if bench_startup() else 1)
+
+    if args.joint:
+        bench_joint(args.markets, args.buckets, seed=args.seed)
+        return
+    if args.distributions:
+        bench_distributions()
+        return
+    if args.sizing:
+        bench_sizing(args.markets, args.buckets, seed=args.seed)
+        return
+
+    fake = FakeManifold(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, error_status=args.error_status, seed=args.seed,
+    )
+    predictions, market_ids = synthetic_markets(fake, args.markets, args.buckets, seed=args.seed)
+    server, base_url = serve(fake)
+    client = ManifoldClient(api_key="bench", base_url=base_url)
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            output = run_dry_run(
+                verbose=False, bankroll=args.bankroll, client=client,
+                predictions=predictions, market_ids=market_ids,
+            )
+        dry_run_time = time.perf_counter() - start
+        fetch_latency = client.latency.format()
+
+        client.latency.reset()
+        bets = [b for b in output["bets"] if b["bet_amount"] >= 1]
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                execute_bets(
+                    bets, confirm=True, client=client,
+                    ledger=Ledger(Path(tmp) / "ledger.sqlite"), rate_limit=args.bet_rate,
+                )
+            execute_time = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    print(f"Markets: {args.markets} x {args.buckets} buckets, "
+          f"latency {args.latency_ms}+U(0,{args.jitter_ms})ms, error rate {args.error_rate:.0%}")
+    print(f"Dry run:  {dry_run_time:.2f}s ({args.markets / dry_run_time:.0f} markets/s)")
+    print(fetch_latency)
+    print(f"Execute:  {execute_time:.2f}s for {len(bets)} bets "
+          f"({len(bets) / execute_time if execute_time else 0:.1f} bets/s)")
+    print(client.latency.format())
+    print(f"Fake server recorded {len(fake.bets)} fills")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 """Configuration for Manifold Markets Kelly betting."""
 
+import os
+from pathlib import Path
+
 # Kelly parameters
 TOTAL_BANKROLL = 17619  # mana (full balance)
 KELLY_FRACTION = 0.25  # quarter-Kelly
@@ -24,5 +27,49 @@ MARKET_IDS = {
 # Reverse mapping for convenience
 MARKET_ID_TO_KEY = {v: k for k, v in MARKET_IDS.items()}
 
-# API configuration
-MANIFOLD_API_BASE = "https://api.manifold.markets/v0"
+# Portfolio engine: a one-factor model of how closely each market tracks
+# overall AI progress (sign = direction); pairwise outcome correlation is the
+# product of two loadings, unlisted markets are independent
+CAPABILITY_LOADINGS = {
+    "01_metr_horizon": -0.7,  # a shorter doubling time means faster progress
+    "02_frontiermath_tier4": 0.7,
+    "05_gsobench": 0.7,
+    "06_epoch_capabilities": 0.8,
+    "07_ai_lab_revenues": 0.6,
+}
+COPULA = "t"  # "t", "gaussian" or "independent"
+COPULA_DOF = 4  # Student-t degrees of freedom (lower = more joint tail events)
+PORTFOLIO_SAMPLES = 200_000  # joint outcomes drawn per dry run
+
+# API configuration (override MANIFOLD_API_BASE to target manifold.fake_server)
+MANIFOLD_API_BASE = os.environ.get("MANIFOLD_API_BASE", "https://api.manifold.markets/v0")
+REQUEST_TIMEOUT = 10.0  # read timeout, seconds per HTTP request
+CONNECT_TIMEOUT = 3.05  # seconds to establish a connection
+HTTP_POOL_SIZE = 32  # keep-alive connections (>= FETCH_WORKERS + BET_WORKERS)
+HTTP_MAX_RETRIES = 3  # transport retries for GETs on connection errors / 429 / 5xx
+HTTP_BACKOFF = 0.3  # seconds, doubled per transport retry
+FETCH_WORKERS = 16  # max concurrent market fetches
+BETS_PAGE_SIZE = 1000  # bets per /bets page (the API maximum)
+
+# Fitted distributions kept in memory, keyed by prediction parameters
+FIT_CACHE_SIZE = 1024
+
+# Output files
+DATA_DIR = Path(__file__).parent.parent.parent.parent / "data" / "2026_predictions" / "manifold"
+
+# On-disk response cache for market reads
+CACHE_DIR = Path(__file__).parent.parent.parent.parent / ".cache" / "manifold"
+CACHE_MAX_STALENESS = 300.0  # seconds a cached response is served without revalidation
+
+# Watch mode: per-market polling interval adapts between these bounds,
+# halving after a move and growing 1.5x after each quiet poll
+WATCH_MIN_INTERVAL = 30.0  # seconds
+WATCH_MAX_INTERVAL = 600.0  # seconds
+WATCH_PRICE_THRESHOLD = 0.02  # max |change| in any answer probability to re-evaluate
+
+# Bet execution
+BET_WORKERS = 8  # max bets in flight at once
+BET_RATE_PER_SEC = 8.0  # sustained bet rate (Manifold allows ~500 req/min)
+BET_BURST = 8  # token bucket capacity
+BET_MAX_RETRIES = 4  # retries on 429/503 before giving up
+BET_RETRY_BASE_DELAY = 0.5  # seconds, doubled per attempt (with full jitter)
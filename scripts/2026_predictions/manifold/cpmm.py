@@ -0,0 +1,163 @@
+"""Local CPMM price-impact model for slippage-aware bet sizing.
+
+Manifold multiple-choice answers are each backed by a constant-product pool
+(p = 0.5): probability = poolNo / (poolYes + poolNo) and poolYes * poolNo is
+held fixed as bets fill. Buying YES with `amount` mints amount YES+NO shares,
+adds the NO shares to the pool and takes out enough YES shares to restore the
+product. Everything here is vectorized over arrays of pools and amounts.
+
+Sizing treats each answer's pool independently; the cross-answer arbitrage
+Manifold applies to sum-to-one markets is ignored.
+"""
+
+import numpy as np
+
+from .config import KELLY_FRACTION, EDGE_THRESHOLD, MAX_POSITION_PCT, MIN_BET_SIZE
+from .kelly import BET_DTYPE
+
+
+BISECTION_STEPS = 60
+
+
+def pools_for_prob(prob: float, liquidity: float) -> tuple[float, float]:
+    """(poolYes, poolNo) for a pool priced at prob with poolYes * poolNo = liquidity**2."""
+    prob = np.clip(prob, 1e-4, 1 - 1e-4)
+    k = liquidity ** 2
+    return np.sqrt(k * (1 - prob) / prob), np.sqrt(k * prob / (1 - prob))
+
+
+def pools_from_market(market: dict) -> tuple[np.ndarray, np.ndarray]:
+    """(poolYes, poolNo) arrays for a market's answers, in answer order.
+
+    Answers without pool state get infinite pools (no price impact).
+    """
+    answers = market.get("answers", [])
+    pool_yes = np.array([a.get("poolYes", np.inf) for a in answers], dtype=float)
+    pool_no = np.array([a.get("poolNo", np.inf) for a in answers], dtype=float)
+    return pool_yes, pool_no
+
+
+def fill(
+    pool_yes: np.ndarray,
+    pool_no: np.ndarray,
+    amount: np.ndarray,
+    buy_yes: np.ndarray,
+    prob: np.ndarray | None = None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Fill bets against CPMM pools.
+
+    Args:
+        pool_yes, pool_no: Pool state before the bet
+        amount: Mana spent
+        buy_yes: True for YES bets, False for NO bets
+        prob: Spot probability, used where pools are infinite (no impact)
+
+    Returns:
+        (shares, new_pool_yes, new_pool_no)
+    """
+    pool_yes, pool_no, amount, buy_yes = np.broadcast_arrays(
+        np.asarray(pool_yes, dtype=float), np.asarray(pool_no, dtype=float),
+        np.asarray(amount, dtype=float), np.asarray(buy_yes, dtype=bool),
+    )
+    finite = np.isfinite(pool_yes) & np.isfinite(pool_no)
+    y = np.where(finite, pool_yes, 1.0)
+    n = np.where(finite, pool_no, 1.0)
+    k = y * n
+
+    new_y = np.where(buy_yes, k / (n + amount), y + amount)
+    new_n = np.where(buy_yes, n + amount, k / (y + amount))
+    shares = np.where(buy_yes, y + amount - new_y, n + amount - new_n)
+
+    if prob is not None and not finite.all():
+        price = np.where(buy_yes, prob, 1 - prob)
+        with np.errstate(divide="ignore"):
+            shares = np.where(finite, shares, amount / price)
+    return shares, np.where(finite, new_y, pool_yes), np.where(finite, new_n, pool_no)
+
+
+def fill_price(pool_yes, pool_no, amount, buy_yes, prob=None) -> np.ndarray:
+    """Average price paid per share for each bet."""
+    shares, _, _ = fill(pool_yes, pool_no, amount, buy_yes, prob)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(shares > 0, np.asarray(amount, dtype=float) / shares, np.nan)
+
+
+def _marginal_shares(pool_yes, pool_no, amount, buy_yes, price):
+    """d(shares)/d(amount): 1 + k / (opposite pool + amount)^2."""
+    finite = np.isfinite(pool_yes) & np.isfinite(pool_no)
+    y = np.where(finite, pool_yes, 1.0)
+    n = np.where(finite, pool_no, 1.0)
+    other = np.where(buy_yes, n, y)
+    return np.where(finite, 1 + y * n / (other + amount) ** 2, 1 / price)
+
+
+def size_bets_slippage(
+    our_probs: list[np.ndarray],
+    market_probs: list[np.ndarray],
+    allocations: list[float],
+    pool_yes: list[np.ndarray],
+    pool_no: list[np.ndarray],
+    kelly_mult: float = KELLY_FRACTION,
+    edge_threshold: float = EDGE_THRESHOLD,
+    max_position_pct: float = MAX_POSITION_PCT,
+    min_bet: float = MIN_BET_SIZE,
+) -> np.ndarray:
+    """Slippage-aware counterpart of kelly.size_bets_batch.
+
+    For each eligible bucket, finds the stake A maximizing
+
+        q log(W - A + shares(A)) + (1 - q) log(W - A)
+
+    with W = kelly_mult * allocation and q our probability of the side bought,
+    by bisection on the derivative, run in lockstep across all buckets. With
+    infinite pools this reduces to the greedy Kelly stake.
+    """
+    lengths = np.array([len(p) for p in our_probs], dtype=np.int64)
+    if lengths.sum() == 0:
+        return np.zeros(0, dtype=BET_DTYPE)
+
+    ours = np.concatenate([np.asarray(p, dtype=float) for p in our_probs])
+    mkts = np.concatenate([np.asarray(p, dtype=float) for p in market_probs])
+    ys = np.concatenate([np.asarray(p, dtype=float) for p in pool_yes])
+    ns = np.concatenate([np.asarray(p, dtype=float) for p in pool_no])
+    alloc = np.repeat(np.asarray(allocations, dtype=float), lengths)
+    market_idx = np.repeat(np.arange(len(lengths), dtype=np.int32), lengths)
+    bucket_idx = np.arange(len(ours), dtype=np.int32) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    edge = ours - mkts
+    buy_yes = edge > 0
+    q = np.where(buy_yes, ours, 1 - ours)
+    price = np.clip(np.where(buy_yes, mkts, 1 - mkts), 1e-9, 1.0)
+    wealth = kelly_mult * alloc
+
+    def slope(amount):
+        shares, _, _ = fill(ys, ns, amount, buy_yes, mkts)
+        ds = _marginal_shares(ys, ns, amount, buy_yes, price)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return q * (ds - 1) / (wealth - amount + shares) - (1 - q) / (wealth - amount)
+
+    lo = np.zeros_like(ours)
+    hi = wealth * (1 - 1e-9)
+    active = (slope(lo) > 0) & (price < 1.0)
+    for _ in range(BISECTION_STEPS):
+        mid = (lo + hi) / 2
+        up = slope(mid) > 0
+        lo = np.where(up, mid, lo)
+        hi = np.where(up, hi, mid)
+    stake = np.where(active, lo, 0.0)
+
+    max_bet = alloc * max_position_pct / KELLY_FRACTION
+    bet_amount = np.minimum(stake, max_bet)
+    keep = (np.abs(edge) >= edge_threshold) & (bet_amount >= min_bet)
+
+    bets = np.zeros(int(keep.sum()), dtype=BET_DTYPE)
+    bets["market"] = market_idx[keep]
+    bets["bucket"] = bucket_idx[keep]
+    bets["our_prob"] = ours[keep]
+    bets["market_prob"] = mkts[keep]
+    bets["edge"] = edge[keep]
+    # Uncapped stake per unit of allocation, as kelly_frac in size_bets_batch
+    bets["kelly_frac"] = (stake / alloc)[keep]
+    bets["bet_amount"] = bet_amount[keep]
+    bets["outcome"] = np.where(buy_yes[keep], "YES", "NO")
+    return bets
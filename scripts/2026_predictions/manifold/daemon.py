@@ -0,0 +1,362 @@
+"""Resident betting service that keeps everything warm between evaluations.
+
+A one-off `python -m manifold.main` pays interpreter start-up, the numpy and
+scipy imports, .env loading and a cold HTTPS connection before any work.
+The daemon pays them once, then holds:
+
+- one ManifoldClient (keep-alive session, ETag cache),
+- the latest payload of every market, refetched once older than
+  --max-staleness (a quiet market revalidates as a 304),
+- process_market results, redone only for markets whose payload or
+  prediction changed, plus the fit and portfolio caches behind them.
+
+predictions.py is reloaded on each request if it was edited, so saving a
+prediction and asking for a dry run re-evaluates all markets from memory.
+
+Endpoints (local only, JSON unless format=text):
+
+    GET  /status                      held markets, caches and request latency
+    GET  /dry-run?bankroll=5000       dry run; also sizing, slippage=0, allocation,
+                                      copula, risk=0, refresh=1 (refetch all markets)
+    GET  /sweep?kelly=0.1,0.25,0.5    sweep; also bankroll, edge, max_position, sizing,
+                                      slippage=0, workers (default 1), refresh=1
+    POST /refresh                     refetch every market now
+
+Usage:
+    python -m manifold.daemon --port 8766
+    curl -s 'http://127.0.0.1:8766/dry-run?format=text'
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import threading
+import time
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from .api import ManifoldClient, ResponseCache
+from .config import CACHE_MAX_STALENESS, COPULA, MANIFOLD_API_BASE, MARKET_IDS, TOTAL_BANKROLL
+from .main import fetch_markets, json_default, process_market, refresh_predictions, run_dry_run
+from .predictions import PREDICTIONS
+from .snapshots import SNAPSHOT_PATH, SnapshotStore
+from .transport import LatencyHistogram
+
+
+class BettingDaemon:
+    """Market payloads and processed results shared by every request.
+
+    Evaluations are serialized by a lock: they share the held state and
+    capture run_dry_run's printed report by redirecting stdout.
+    """
+
+    def __init__(
+        self,
+        client: ManifoldClient,
+        market_ids: dict[str, str] | None = None,
+        max_staleness: float = CACHE_MAX_STALENESS,
+        store: SnapshotStore | None = None,
+    ):
+        self.client = client
+        self.market_ids = MARKET_IDS if market_ids is None else market_ids
+        self.max_staleness = max_staleness
+        self.store = store
+        self.markets: dict[str, dict] = {}  # prediction key -> payload
+        self.fetched_at: dict[str, float] = {}  # prediction key -> time.monotonic()
+        self.processed: dict[str, tuple] = {}  # prediction key -> (payload, prediction, result)
+        self.latency = LatencyHistogram()
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def refresh(self, force: bool = False) -> list[str]:
+        """Refetch markets held longer than max_staleness (all of them with force).
+
+        A refetched payload equal to the held one is dropped, so the held
+        object (and its processed result) stays valid. Returns the keys
+        whose payload changed.
+        """
+        now = time.monotonic()
+        due = {
+            k: mid for k, mid in self.market_ids.items()
+            if k in PREDICTIONS and (force or now - self.fetched_at.get(k, float("-inf")) > self.max_staleness)
+        }
+        if not due:
+            return []
+        changed = []
+        for key, market in fetch_markets(self.client, due, store=self.store).items():
+            if isinstance(market, Exception):
+                print(f"  Error fetching {key}: {market}")
+                continue
+            self.fetched_at[key] = now
+            if self.markets.get(key) != market:
+                self.markets[key] = market
+                changed.append(key)
+        return changed
+
+    def update(self, refresh: bool = False):
+        """Pick up edits to predictions.py, then refetch stale (with refresh, all) markets."""
+        try:
+            refresh_predictions()
+        except Exception as e:
+            print(f"  Error reloading predictions.py, keeping the previous predictions: {e}")
+        self.refresh(force=refresh)
+
+    def market_results(self) -> tuple[dict[str, dict], list[str]]:
+        """process_market results for every held market, and the keys reprocessed.
+
+        Only markets whose payload or prediction changed since their last
+        evaluation are reprocessed.
+        """
+        results, reprocessed = {}, []
+        for key, prediction in PREDICTIONS.items():
+            market = self.markets.get(key)
+            if market is None:
+                continue
+            held = self.processed.get(key)
+            # A reload redefines the Prediction class, so compare fields
+            if held is not None and held[0] is market and vars(held[1]) == vars(prediction):
+                results[key] = held[2]
+                continue
+            try:
+                result = process_market(market, key, prediction, verbose=False, market_id=self.market_ids[key])
+            except Exception as e:
+                print(f"  Error processing {key}: {e}")
+                continue
+            self.processed[key] = (market, prediction, result)
+            results[key] = result
+            reprocessed.append(key)
+        return results, reprocessed
+
+    def dry_run(
+        self,
+        bankroll: float = TOTAL_BANKROLL,
+        sizing: str = "greedy",
+        slippage: bool = True,
+        allocation: str = "edge",
+        copula: str = COPULA,
+        risk: bool = True,
+        refresh: bool = False,
+    ) -> tuple[dict, str]:
+        """run_dry_run over the held markets; returns (output, printed report)."""
+        with self.lock:
+            start = time.perf_counter()
+            self.update(refresh)
+            results, reprocessed = self.market_results()
+            report = io.StringIO()
+            with redirect_stdout(report):
+                output = run_dry_run(
+                    verbose=False, bankroll=bankroll, sizing=sizing, slippage=slippage,
+                    allocation=allocation, copula=copula, risk=risk, market_results=results,
+                )
+            output["daemon"] = {
+                "reprocessed": reprocessed,
+                "elapsed_ms": (time.perf_counter() - start) * 1000,
+            }
+        return output, report.getvalue()
+
+    def sweep(
+        self,
+        bankrolls: list[float],
+        kelly_fractions: list[float],
+        edge_thresholds: list[float],
+        max_position_pcts: list[float],
+        sizing: str = "greedy",
+        slippage: bool = True,
+        workers: int = 1,
+        refresh: bool = False,
+    ) -> tuple[list[dict], str]:
+        """run_sweep over the held markets; returns (results, printed table).
+
+        Runs in-process by default. With workers > 1 the pool is started via
+        forkserver: forking the threaded server could copy a held lock.
+        """
+        from .sweep import print_sweep, run_sweep, sweep_grid
+
+        with self.lock:
+            self.update(refresh)
+            results, _ = self.market_results()
+            configs = sweep_grid(bankrolls, kelly_fractions, edge_thresholds, max_position_pcts)
+            rows = run_sweep(
+                results, configs, sizing=sizing, slippage=slippage, workers=workers,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+            report = io.StringIO()
+            with redirect_stdout(report):
+                print_sweep(rows)
+        return rows, report.getvalue()
+
+    def status(self) -> dict:
+        """Held markets and their ages, cache sizes and request latency."""
+        from .distributions import fit_cached
+
+        with self.lock:
+            now = time.monotonic()
+            markets = {
+                key: {
+                    "market_id": self.market_ids[key],
+                    "age_s": now - self.fetched_at[key],
+                    "processed": key in self.processed and self.processed[key][0] is market,
+                }
+                for key, market in self.markets.items()
+            }
+        return {
+            "uptime_s": time.time() - self.started,
+            "predictions": len(PREDICTIONS),
+            "markets": markets,
+            "fit_cache": fit_cached.cache_info()._asdict(),
+            "requests": self.latency.summary(),
+            "api_requests": self.client.latency.summary(),
+        }
+
+
+def _flag(params: dict[str, str], name: str, default: bool) -> bool:
+    if name not in params:
+        return default
+    return params[name].lower() not in ("0", "false", "no", "")
+
+
+def _floats(params: dict[str, str], name: str, default: list[float]) -> list[float]:
+    if name not in params:
+        return default
+    return [float(v) for v in params[name].split(",")]
+
+
+def _choice(params: dict[str, str], name: str, choices: tuple[str, ...], default: str) -> str:
+    value = params.get(name, default)
+    if value not in choices:
+        raise ValueError(f"{name} must be one of {', '.join(choices)}")
+    return value
+
+
+def make_handler(daemon: BettingDaemon) -> type[BaseHTTPRequestHandler]:
+    """Build a request handler class bound to a BettingDaemon."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        # Request counts and latency are reported by /status instead
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body, text: str | None = None):
+            if text is not None:
+                data, content_type = text.encode(), "text/plain; charset=utf-8"
+            else:
+                data, content_type = json.dumps(body, default=json_default).encode(), "application/json"
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _route(self, method: str):
+            length = int(self.headers.get("Content-Length", 0))
+            if length:
+                self.rfile.read(length)
+            url = urlparse(self.path)
+            path = url.path.rstrip("/")
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            as_text = params.get("format") == "text"
+            start = time.perf_counter()
+            try:
+                if path == "/status":
+                    status = daemon.status()
+                    self._send(200, status, json.dumps(status, indent=2, default=json_default) if as_text else None)
+                elif path == "/dry-run":
+                    output, report = daemon.dry_run(
+                        bankroll=float(params.get("bankroll", TOTAL_BANKROLL)),
+                        sizing=_choice(params, "sizing", ("greedy", "joint"), "greedy"),
+                        slippage=_flag(params, "slippage", True),
+                        allocation=_choice(params, "allocation", ("edge", "copula"), "edge"),
+                        copula=_choice(params, "copula", ("t", "gaussian", "independent"), COPULA),
+                        risk=_flag(params, "risk", True),
+                        refresh=_flag(params, "refresh", False),
+                    )
+                    self._send(200, output, report if as_text else None)
+                elif path == "/sweep":
+                    rows, report = daemon.sweep(
+                        _floats(params, "bankroll", [TOTAL_BANKROLL]),
+                        _floats(params, "kelly", [0.1, 0.25, 0.5, 1.0]),
+                        _floats(params, "edge", [0.05, 0.10, 0.15, 0.20]),
+                        _floats(params, "max_position", [0.05, 0.10, 0.20]),
+                        sizing=_choice(params, "sizing", ("greedy", "joint"), "greedy"),
+                        slippage=_flag(params, "slippage", True),
+                        workers=int(params.get("workers", 1)),
+                        refresh=_flag(params, "refresh", False),
+                    )
+                    self._send(200, rows, report if as_text else None)
+                elif path == "/refresh" and method == "POST":
+                    with daemon.lock:
+                        changed = daemon.refresh(force=True)
+                    self._send(200, {"changed": changed})
+                else:
+                    self._send(404, {"message": f"Not found: {method} {url.path}"})
+                    return
+            except ValueError as e:
+                self._send(400, {"message": str(e)})
+                return
+            except Exception as e:
+                self._send(500, {"message": f"{type(e).__name__}: {e}"})
+                return
+            daemon.latency.record(path, time.perf_counter() - start)
+
+        def do_GET(self):
+            self._route("GET")
+
+        def do_POST(self):
+            self._route("POST")
+
+    return Handler
+
+
+def serve(daemon: BettingDaemon, host: str = "127.0.0.1", port: int = 0) -> tuple[ThreadingHTTPServer, str]:
+    """Start the daemon's HTTP endpoint on a background thread.
+
+    Returns (server, base_url); call server.shutdown() to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(daemon))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident Kelly betting service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--api-base", default=None,
+                        help="API base URL, e.g. a local manifold.fake_server (default: MANIFOLD_API_BASE)")
+    parser.add_argument("--max-staleness", type=float, default=CACHE_MAX_STALENESS,
+                        help="Refetch a held market once it is this many seconds old")
+    parser.add_argument("--no-cache", action="store_true", help="Don't revalidate through the on-disk market cache")
+    parser.add_argument("--no-record", action="store_true",
+                        help="Don't record fetched market payloads in the snapshot store")
+    parser.add_argument("--snapshots", type=Path, default=SNAPSHOT_PATH, help="Snapshot store path")
+    args = parser.parse_args()
+
+    # The daemon holds payloads itself; refetches always revalidate (cheap 304s)
+    cache = None if args.no_cache else ResponseCache(max_staleness=0.0)
+    client = ManifoldClient(cache=cache, base_url=args.api_base or MANIFOLD_API_BASE)
+    store = None if args.no_record else SnapshotStore(args.snapshots)
+    daemon = BettingDaemon(client, max_staleness=args.max_staleness, store=store)
+
+    # One full evaluation up front, so the first request is already warm
+    start = time.perf_counter()
+    daemon.dry_run()
+    print(f"Warmed {len(daemon.markets)} markets in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    server, url = serve(daemon, args.host, args.port)
+    print(f"Betting daemon on {url} (/status, /dry-run, /sweep, /refresh)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+    if store is not None:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,279 @@
 """Distribution fitting and bucket probability calculations."""
 
 from dataclasses import dataclass
-from typing import Any, Literal
+from functools import lru_cache
+from typing import Any, Literal, Mapping, Sequence
 import numpy as np
-from scipy import stats
+from scipy.special import expit, log_ndtr, ndtr, ndtri, ndtri_exp
 
+from .config import FIT_CACHE_SIZE
 
-DistributionType = Literal["normal", "lognormal", "truncated_normal"]
 
+DistributionType = Literal["normal", "lognormal", "truncated_normal", "metalog"]
 
-@dataclass
+_INV_SQRT_2PI = 1.0 / np.sqrt(2 * np.pi)
+_TINY = np.finfo(float).tiny
+
+
+# Closed-form distributions built on ndtr/ndtri ufuncs. Unlike scipy frozen
+# distributions they do no argument validation, so scalar calls are cheap,
+# and params may be arrays that broadcast against x.
+
+class NormalDist:
+    """Normal distribution."""
+
+    __slots__ = ("loc", "scale")
+
+    def __init__(self, loc, scale):
+        self.loc = loc
+        self.scale = scale
+
+    def cdf(self, x):
+        return ndtr((x - self.loc) / self.scale)
+
+    def pdf(self, x):
+        z = (x - self.loc) / self.scale
+        return np.exp(-0.5 * z * z) * _INV_SQRT_2PI / self.scale
+
+    def ppf(self, q):
+        return self.loc + self.scale * ndtri(q)
+
+
+class LogNormalDist:
+    """Log-normal distribution: log(X) ~ Normal(mu, sigma)."""
+
+    __slots__ = ("mu", "sigma")
+
+    def __init__(self, mu, sigma):
+        self.mu = mu
+        self.sigma = sigma
+
+    def cdf(self, x):
+        # Clamping at the smallest positive float sends x <= 0 to cdf 0
+        # without tripping log(0) warnings
+        return ndtr((np.log(np.maximum(x, _TINY)) - self.mu) / self.sigma)
+
+    def pdf(self, x):
+        safe_x = np.maximum(x, _TINY)
+        z = (np.log(safe_x) - self.mu) / self.sigma
+        density = np.exp(-0.5 * z * z) * _INV_SQRT_2PI / (safe_x * self.sigma)
+        return np.where(x > 0, density, 0.0)
+
+    def ppf(self, q):
+        return np.exp(self.mu + self.sigma * ndtri(q))
+
+
+class TruncNormalDist:
+    """Normal(loc, scale) truncated to standardized bounds [a, b].
+
+    Computed from log CDFs, with windows above the mean (a > 0) reflected
+    to the lower tail, so a window far out in a tail keeps its precision
+    instead of its mass underflowing to zero.
+    """
+
+    __slots__ = ("loc", "scale", "a", "b", "_sign", "_log_hi", "_r_lo", "_rel_mass")
+
+    def __init__(self, loc, scale, a=-np.inf, b=np.inf):
+        self.loc = loc
+        self.scale = scale
+        self.a = a
+        self.b = b
+        flip = np.asarray(a) > 0
+        self._sign = np.where(flip, -1.0, 1.0)[()]
+        # Window [lo, hi] in the (reflected) frame, relative to Phi(hi)
+        lo = np.where(flip, -np.asarray(b), a)[()]
+        hi = np.where(flip, -np.asarray(a), b)[()]
+        self._log_hi = log_ndtr(hi)
+        log_ratio = log_ndtr(lo) - self._log_hi
+        self._r_lo = np.exp(log_ratio)
+        self._rel_mass = -np.expm1(log_ratio)
+
+    def cdf(self, x):
+        w = self._sign * (x - self.loc) / self.scale
+        frac = (np.exp(np.minimum(log_ndtr(w) - self._log_hi, 0.0)) - self._r_lo) / self._rel_mass
+        # Reflected windows measured 1 - cdf
+        return np.clip(0.5 * (1.0 - self._sign) + self._sign * frac, 0.0, 1.0)
+
+    def pdf(self, x):
+        z = (x - self.loc) / self.scale
+        log_mass = self._log_hi + np.log(self._rel_mass)
+        # Clamped to the window so the exponent stays bounded outside it
+        zc = np.clip(z, self.a, self.b)
+        density = np.exp(-0.5 * zc * zc - log_mass) * _INV_SQRT_2PI / self.scale
+        return np.where((z >= self.a) & (z <= self.b), density, 0.0)
+
+    def ppf(self, q):
+        p = 0.5 * (1.0 - self._sign) + self._sign * q
+        with np.errstate(divide="ignore"):
+            w = ndtri_exp(self._log_hi + np.log(self._r_lo + p * self._rel_mass))
+        # Clipped: the far bound's share can underflow, leaving w infinite
+        return self.loc + self.scale * np.clip(self._sign * w, self.a, self.b)
+
+
+class MetalogDist:
+    """Metalog distribution (Keelin 2016), optionally bounded.
+
+    The quantile function is linear in its coefficients `a` (last axis):
+    Q(y) = a1 + a2*L + a3*u*L + a4*u + a5*u^2 + a6*u^2*L + ..., with
+    L = logit(y) and u = y - 0.5, applied to z = x, log(x - lower) or
+    log((x - lower) / (upper - x)) depending on the bounds. Everything is
+    evaluated in t = logit(y), which keeps the tails exact. The cdf inverts Q
+    by safeguarded Newton iteration over the whole array at once.
+    """
+
+    __slots__ = ("a", "lower", "upper")
+
+    def __init__(self, a, lower=None, upper=None):
+        self.a = np.asarray(a, dtype=float)
+        self.lower = lower
+        self.upper = upper
+
+    def _quantile_t(self, t, derivative=False):
+        """Q (or dQ/dt) at t = logit(y); t broadcasts against a[..., 0]."""
+        t = np.asarray(t, dtype=float)
+        a = self.a
+        k = a.shape[-1]
+        u = expit(t) - 0.5
+        s = 0.25 - u * u  # y (1 - y)
+        if derivative:
+            out = a[..., 1] + 0 * t
+            if k > 2:
+                out = out + a[..., 2] * (u + s * t)
+            if k > 3:
+                out = out + a[..., 3] * s
+        else:
+            out = a[..., 0] + a[..., 1] * t
+            if k > 2:
+                out = out + a[..., 2] * (u * t)
+            if k > 3:
+                out = out + a[..., 3] * u
+        for j in range(5, k + 1):
+            p = (j - 1) // 2
+            if derivative:
+                du = p * u ** (p - 1) * s
+                term = du if j % 2 else du * t + u ** p
+            else:
+                term = u ** p if j % 2 else u ** p * t
+            out = out + a[..., j - 1] * term
+        return out
+
+    def _to_z(self, x):
+        """Map x into the unbounded metalog space (+/-inf outside the bounds)."""
+        z = x
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if self.lower is not None and self.upper is not None:
+                z = np.log((x - self.lower) / (self.upper - x))
+            elif self.lower is not None:
+                z = np.log(x - self.lower)
+            elif self.upper is not None:
+                z = -np.log(self.upper - x)
+        if self.lower is not None:
+            z = np.where(x <= self.lower, -np.inf, z)
+        if self.upper is not None:
+            z = np.where(x >= self.upper, np.inf, z)
+        return z
+
+    def _from_z(self, z):
+        if self.lower is not None and self.upper is not None:
+            return self.lower + (self.upper - self.lower) * expit(z)
+        if self.lower is not None:
+            return self.lower + np.exp(z)
+        if self.upper is not None:
+            return self.upper - np.exp(-z)
+        return z
+
+    def _dz_dx(self, x):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if self.lower is not None and self.upper is not None:
+                return (self.upper - self.lower) / ((x - self.lower) * (self.upper - x))
+            if self.lower is not None:
+                return 1 / (x - self.lower)
+            if self.upper is not None:
+                return 1 / (self.upper - x)
+        return np.ones_like(x)
+
+    def _solve_t(self, z, tol=1e-12, max_iter=60):
+        """t with Q(t) = z, by Newton steps kept inside a shrinking bracket."""
+        a1, a2 = self.a[..., 0], self.a[..., 1]
+        lo = np.full(np.broadcast(z, a1).shape, -_T_MAX)
+        hi = -lo
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.clip(np.nan_to_num((z - a1) / a2), lo, hi)  # logistic approximation
+        for _ in range(max_iter):
+            f = self._quantile_t(t) - z
+            lo = np.where(f <= 0, t, lo)
+            hi = np.where(f > 0, t, hi)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t_new = t - f / self._quantile_t(t, derivative=True)
+            t_new = np.where((t_new >= lo) & (t_new <= hi), t_new, 0.5 * (lo + hi))
+            done = np.all(np.abs(t_new - t) < tol)
+            t = t_new
+            if done:
+                break
+        return t
+
+    def cdf(self, x):
+        x = np.asarray(x, dtype=float)
+        z = self._to_z(x)
+        # Solve only where finite: an infinite target would need a full bisection
+        y = expit(self._solve_t(np.where(np.isfinite(z), z, self.a[..., 0])))
+        return np.where(z == np.inf, 1.0, np.where(z == -np.inf, 0.0, y))
+
+    def pdf(self, x):
+        x = np.asarray(x, dtype=float)
+        z = self._to_z(x)
+        finite = np.isfinite(z)
+        t = self._solve_t(np.where(finite, z, self.a[..., 0]))
+        # f(x) = dz/dx / (dQ/dy), with dQ/dy = (dQ/dt) / (y (1 - y))
+        y = expit(t)
+        density = self._dz_dx(x) * y * (1 - y) / self._quantile_t(t, derivative=True)
+        return np.where(finite, density, 0.0)
+
+    def ppf(self, q):
+        with np.errstate(divide="ignore"):
+            t = np.log(q) - np.log1p(-np.asarray(q, dtype=float))
+        return self._from_z(self._quantile_t(t))
+
+
+_T_MAX = 40.0  # |logit(y)| bracket; expit(40) is within 5e-18 of 1
+METALOG_MAX_TERMS = 9
+
+
+def _as_output(value):
+    """Return Python floats for scalar results, arrays otherwise."""
+    return float(value) if np.ndim(value) == 0 else value
+
+
+@dataclass(slots=True)
 class FittedDistribution:
-    """A fitted probability distribution."""
+    """A fitted probability distribution.
+
+    cdf/pdf/ppf accept scalars (returning float) or arrays.
+    """
 
     dist_type: DistributionType
     params: dict
-    scipy_dist: Any  # scipy frozen distribution
+    dist: Any  # NormalDist, LogNormalDist, TruncNormalDist or MetalogDist
 
     def cdf(self, x: float) -> float:
         """Cumulative distribution function."""
-        return float(self.scipy_dist.cdf(x))
+        return _as_output(self.dist.cdf(x))
 
     def pdf(self, x: float) -> float:
         """Probability density function."""
-        return float(self.scipy_dist.pdf(x))
+        return _as_output(self.dist.pdf(x))
 
     def ppf(self, q: float) -> float:
         """Percent point function (quantile)."""
-        return float(self.scipy_dist.ppf(q))
+        return _as_output(self.dist.ppf(q))
+
+    def cdf_array(self, x: np.ndarray) -> np.ndarray:
+        """Vectorized CDF.
+
+        For a batched distribution (array params of shape (n, 1), see
+        fit_distribution_batch) evaluating at edges of shape (m,) returns (n, m).
+        """
+        return np.asarray(self.dist.cdf(x), dtype=float)
 
 
 def fit_distribution(
@@ -37,6 +283,7 @@ def fit_distribution(
     dist_type: DistributionType | None = None,
     lower_bound: float | None = None,
     upper_bound: float | None = None,
+    quantiles: Mapping[float, float] | None = None,
 ) -> FittedDistribution:
     """Fit a distribution to median and 10th/90th percentiles.
 
@@ -45,7 +292,15 @@ def fit_distribution(
     - otherwise -> normal
 
     For truncated_normal, requires lower_bound and/or upper_bound.
+    For metalog, fits all of `quantiles` ({probability: value}) if given,
+    otherwise the three percentiles.
     """
+    if dist_type == "metalog":
+        if quantiles is not None:
+            return fit_metalog(quantiles, lower_bound, upper_bound)
+        values = np.stack(np.broadcast_arrays(p10, median, p90), axis=-1)
+        return fit_metalog_batch([0.1, 0.5, 0.9], values, lower_bound, upper_bound)
+
     if dist_type is None:
         # Check for asymmetry
         if median - p10 > 0:
@@ -66,6 +321,39 @@ def fit_distribution(
         return _fit_normal(median, p10, p90)
 
 
+@lru_cache(maxsize=FIT_CACHE_SIZE)
+def fit_cached(
+    median: float,
+    p10: float,
+    p90: float,
+    dist_type: DistributionType | None = None,
+    lower_bound: float | None = None,
+    upper_bound: float | None = None,
+    quantiles: tuple[tuple[float, float], ...] | None = None,
+) -> FittedDistribution:
+    """Memoized fit_distribution for scalar parameters.
+
+    The key is the full parameter tuple, so an edited prediction simply misses
+    and refits. quantiles is passed as (probability, value) pairs so it is
+    hashable. Callers must treat the returned distribution as read-only, as
+    it is shared.
+    """
+    return fit_distribution(
+        median, p10, p90, dist_type, lower_bound, upper_bound,
+        dict(quantiles) if quantiles is not None else None,
+    )
+
+
+def fit_prediction(prediction) -> FittedDistribution:
+    """Fit (memoized) the distribution for a predictions.Prediction."""
+    quantiles = prediction.quantiles
+    return fit_cached(
+        prediction.median, prediction.p10, prediction.p90, prediction.dist_type,
+        prediction.lower_bound, prediction.upper_bound,
+        tuple(sorted(quantiles.items())) if quantiles is not None else None,
+    )
+
+
 def _fit_normal(median: float, p10: float, p90: float) -> FittedDistribution:
     """Fit a normal distribution."""
     # For normal: median = mean
@@ -73,11 +361,11 @@ def _fit_normal(median: float, p10: float, p90: float) -> FittedDistribution:
     # p90 - p10 spans 2 * 1.28 * sigma (since z_0.9 ≈ 1.28)
     sigma = (p90 - p10) / (2 * 1.28)
 
-    dist = stats.norm(loc=mean, scale=sigma)
+    dist = NormalDist(loc=mean, scale=sigma)
     return FittedDistribution(
         dist_type="normal",
         params={"mean": mean, "sigma": sigma},
-        scipy_dist=dist,
+        dist=dist,
     )
 
 
@@ -89,7 +377,7 @@ def _fit_lognormal(median: float, p10: float, p90: float) -> FittedDistribution:
     - p10 = exp(mu - 1.28*sigma)
     - p90 = exp(mu + 1.28*sigma)
     """
-    if median <= 0 or p10 <= 0 or p90 <= 0:
+    if np.any(np.asarray(median) <= 0) or np.any(np.asarray(p10) <= 0) or np.any(np.asarray(p90) <= 0):
         raise ValueError("Log-normal requires positive values")
 
     mu = np.log(median)
@@ -98,12 +386,11 @@ def _fit_lognormal(median: float, p10: float, p90: float) -> FittedDistribution:
     sigma_from_p90 = (np.log(p90) - mu) / 1.28
     sigma = (sigma_from_p10 + sigma_from_p90) / 2
 
-    # scipy lognormal: scale=exp(mu), s=sigma
-    dist = stats.lognorm(s=sigma, scale=np.exp(mu))
+    dist = LogNormalDist(mu=mu, sigma=sigma)
     return FittedDistribution(
         dist_type="lognormal",
         params={"mu": mu, "sigma": sigma},
-        scipy_dist=dist,
+        dist=dist,
     )
 
 
@@ -128,7 +415,7 @@ def _fit_truncated_normal(
     a = (lower_bound - mean) / sigma if lower_bound is not None else -np.inf
     b = (upper_bound - mean) / sigma if upper_bound is not None else np.inf
 
-    dist = stats.truncnorm(a=a, b=b, loc=mean, scale=sigma)
+    dist = TruncNormalDist(loc=mean, scale=sigma, a=a, b=b)
     return FittedDistribution(
         dist_type="truncated_normal",
         params={
@@ -137,42 +424,148 @@ def _fit_truncated_normal(
             "lower_bound": lower_bound,
             "upper_bound": upper_bound,
         },
-        scipy_dist=dist,
+        dist=dist,
     )
 
 
+def _metalog_basis(probs: np.ndarray, k: int) -> np.ndarray:
+    """Metalog basis matrix (len(probs), k)."""
+    return np.stack([MetalogDist(np.eye(k)[j])._quantile_t(np.log(probs / (1 - probs)))
+                     for j in range(k)], axis=-1)
+
+
+def fit_metalog_batch(
+    probs: Sequence[float],
+    values: np.ndarray,
+    lower_bound: float | None = None,
+    upper_bound: float | None = None,
+    terms: int | None = None,
+) -> FittedDistribution:
+    """Least-squares metalog fit of many forecasts sharing quantile levels.
+
+    values has shape (..., len(probs)) and the coefficients (..., k); pass
+    (n, 1, len(probs)) so that cdf_array over m edges yields (n, m), as with
+    fit_distribution_batch. All rows share one basis matrix, so the fit is a
+    single pseudo-inverse product. Unless `terms` is given, uses the most
+    terms (up to len(probs) and METALOG_MAX_TERMS) whose quantile function
+    is increasing for every row.
+    """
+    probs = np.asarray(probs, dtype=float)
+    values = np.asarray(values, dtype=float)
+    if probs.ndim != 1 or len(probs) < 2 or np.any((probs <= 0) | (probs >= 1)):
+        raise ValueError("Metalog needs at least two quantile levels in (0, 1)")
+    dist = MetalogDist(np.zeros(2), lower_bound, upper_bound)
+    z = dist._to_z(values)
+    if not np.all(np.isfinite(z)):
+        raise ValueError("Metalog quantiles must lie strictly inside the bounds")
+
+    grid = np.linspace(-_T_MAX / 2, _T_MAX / 2, 401).reshape((-1,) + (1,) * (z.ndim - 1))
+    candidates = [terms] if terms else range(min(len(probs), METALOG_MAX_TERMS), 1, -1)
+    for k in candidates:
+        basis = _metalog_basis(probs, k)
+        if not terms and np.linalg.matrix_rank(basis) < k:
+            continue  # e.g. 7 symmetric levels only determine 6 terms
+        dist.a = z @ np.linalg.pinv(basis).T
+        if np.all(dist._quantile_t(grid, derivative=True) > 0):
+            break
+    else:
+        raise ValueError("No feasible metalog fits these quantiles")
+    a = dist.a
+
+    return FittedDistribution(
+        dist_type="metalog",
+        params={
+            "coefficients": a,
+            "quantiles": dict(zip(probs.tolist(), values.T.tolist())),
+            "lower_bound": lower_bound,
+            "upper_bound": upper_bound,
+        },
+        dist=dist,
+    )
+
+
+def fit_metalog(
+    quantiles: Mapping[float, float],
+    lower_bound: float | None = None,
+    upper_bound: float | None = None,
+    terms: int | None = None,
+) -> FittedDistribution:
+    """Fit a metalog to any set of percentiles, e.g. {0.05: 6, 0.5: 26, 0.95: 58}.
+
+    With as many terms as points the fit is exact; see fit_metalog_batch.
+    """
+    probs = sorted(quantiles)
+    return fit_metalog_batch(probs, [quantiles[p] for p in probs], lower_bound, upper_bound, terms)
+
+
+def fit_distribution_batch(
+    medians: np.ndarray,
+    p10s: np.ndarray,
+    p90s: np.ndarray,
+    dist_type: DistributionType,
+    lower_bound: float | None = None,
+    upper_bound: float | None = None,
+) -> FittedDistribution:
+    """Fit n distributions of one family in a single vectorized call.
+
+    The returned distribution has params of shape (n, 1), so cdf_array over m
+    bucket edges yields an (n, m) array and compute_bucket_probs returns one
+    row of bucket probabilities per distribution.
+    """
+    medians = np.asarray(medians, dtype=float)[:, None]
+    p10s = np.asarray(p10s, dtype=float)[:, None]
+    p90s = np.asarray(p90s, dtype=float)[:, None]
+    return fit_distribution(medians, p10s, p90s, dist_type, lower_bound, upper_bound)
+
+
+def bucket_edges(
+    buckets: list[tuple[float | None, float | None]],
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Collect the unique bucket edges.
+
+    Unbounded sides map to -inf/+inf. Returns (edges, lower_idx, upper_idx)
+    where edges is sorted and bucket i spans edges[lower_idx[i]] to
+    edges[upper_idx[i]].
+    """
+    lowers = np.array([-np.inf if lo is None else lo for lo, _ in buckets], dtype=float)
+    uppers = np.array([np.inf if hi is None else hi for _, hi in buckets], dtype=float)
+    edges, inverse = np.unique(np.concatenate([lowers, uppers]), return_inverse=True)
+    n = len(buckets)
+    return edges, inverse[:n], inverse[n:]
+
+
 def compute_bucket_probs(
-    dist: FittedDistribution,
+    dist: FittedDistribution | Sequence[FittedDistribution],
     buckets: list[tuple[float | None, float | None]],
 ) -> np.ndarray:
     """Compute probability for each bucket.
 
     Each bucket is (lower, upper) where None means unbounded.
 
-    Returns array of probabilities (sums to 1).
-    """
-    probs = []
+    The CDF is evaluated once over the unique edges rather than twice per
+    bucket. dist may also be a batched distribution (fit_distribution_batch)
+    or a sequence of distributions, in which case the result is a 2-D
+    (distributions x buckets) array.
 
-    for lower, upper in buckets:
-        if lower is None:
-            cdf_lower = 0.0
-        else:
-            cdf_lower = dist.cdf(lower)
+    Returns array of probabilities (each row sums to 1).
+    """
+    if len(buckets) == 0:
+        return np.zeros(0)
 
-        if upper is None:
-            cdf_upper = 1.0
-        else:
-            cdf_upper = dist.cdf(upper)
+    edges, lower_idx, upper_idx = bucket_edges(buckets)
+    if isinstance(dist, FittedDistribution):
+        cdf = dist.cdf_array(edges)
+    else:
+        cdf = np.stack([d.cdf_array(edges) for d in dist])
 
-        prob = cdf_upper - cdf_lower
-        probs.append(max(0, prob))  # Ensure non-negative
+    # Pin the infinite edges exactly (some CDFs return nan at +/-inf)
+    cdf = np.where(edges == -np.inf, 0.0, np.where(edges == np.inf, 1.0, cdf))
 
-    probs = np.array(probs)
+    probs = np.maximum(cdf[..., upper_idx] - cdf[..., lower_idx], 0.0)  # Ensure non-negative
 
     # Normalize to sum to 1 (handles any edge cases)
-    total = probs.sum()
-    if total > 0:
-        probs = probs / total
+    total = probs.sum(axis=-1, keepdims=True)
+    probs = np.divide(probs, total, out=probs, where=total > 0)
 
     return probs
 
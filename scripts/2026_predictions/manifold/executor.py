@@ -0,0 +1,121 @@
+"""Concurrent, rate-limited bet execution."""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Iterator
+
+import requests
+
+from .api import ManifoldClient
+from .config import (
+    BET_WORKERS, BET_RATE_PER_SEC, BET_BURST, BET_MAX_RETRIES, BET_RETRY_BASE_DELAY,
+)
+
+
+# Only statuses that mean the bet was rejected before it was processed: a
+# 500/502/504 can arrive after the order was committed
+RETRYABLE_STATUS = {429, 503}
+
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter.
+
+    Allows bursts of up to `capacity` calls, refilling at `rate` tokens/second.
+    """
+
+    def __init__(self, rate: float = BET_RATE_PER_SEC, capacity: int = BET_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Whether a failed bet should be retried (429 or 503).
+
+    Timeouts, connection errors and other 5xx responses are not retried: the
+    bet may already have been placed, and retrying would double it. They are
+    reported as errors for the caller to check against our positions.
+    """
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code in RETRYABLE_STATUS
+    return False
+
+
+def call_with_retry(
+    fn: Callable[[], Any],
+    limiter: TokenBucket | None = None,
+    max_retries: int = BET_MAX_RETRIES,
+    base_delay: float = BET_RETRY_BASE_DELAY,
+) -> Any:
+    """Call fn, retrying retryable errors with full-jitter exponential backoff."""
+    attempt = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            retry_after = None
+            if isinstance(e, requests.HTTPError):
+                retry_after = e.response.headers.get("Retry-After")
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = random.uniform(0, base_delay * 2 ** attempt)
+            time.sleep(delay)
+            attempt += 1
+
+
+def place_bets(
+    client: ManifoldClient,
+    bets: list[dict],
+    max_workers: int = BET_WORKERS,
+    limiter: TokenBucket | None = None,
+) -> Iterator[tuple[dict, dict | str, str]]:
+    """Place bets through a bounded worker pool.
+
+    Yields (bet, response, status) tuples in completion order, where status is
+    "success" or "error" and response is the API response or the error message.
+    """
+    if not bets:
+        return
+    limiter = limiter or TokenBucket()
+
+    def place(bet: dict) -> dict:
+        return call_with_retry(
+            lambda: client.place_bet(
+                market_id=bet["market_id"],
+                answer_id=bet["answer_id"],
+                amount=bet["bet_amount"],
+                outcome=bet["outcome"],
+            ),
+            limiter=limiter,
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(bets)))) as pool:
+        futures = {pool.submit(place, bet): bet for bet in bets}
+        for future in as_completed(futures):
+            bet = futures[future]
+            try:
+                yield bet, future.result(), "success"
+            except Exception as e:
+                yield bet, str(e), "error"
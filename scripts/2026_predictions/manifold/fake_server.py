@@ -0,0 +1,285 @@
+"""Local stand-in for the Manifold API, for offline runs and load tests.
+
+Implements the endpoints ManifoldClient uses:
+
+    GET  /market/{id}
+    GET  /market/{id}/positions
+    GET  /me
+    GET  /bets
+    POST /bet
+
+Each answer of a multiple-choice market is backed by its own CPMM pool
+(constant product, p = 0.5), so prices move as bets land. After each bet the
+other answers in the market are rescaled so probabilities still sum to one.
+
+Usage:
+    python -m manifold.fake_server --port 8765 --latency-ms 50 --error-rate 0.02
+    MANIFOLD_API_BASE=http://127.0.0.1:8765 python -m manifold.main --dry-run
+"""
+
+import argparse
+import gzip
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from .config import DATA_DIR
+from .cpmm import fill, pools_for_prob
+
+
+DEFAULT_LIQUIDITY = 1000.0  # mana of liquidity per answer pool
+
+
+class FakeManifold:
+    """In-memory market, bet and position state for the fake server."""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 500, seed: int | None = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.markets: dict[str, dict] = {}
+        self.bets: list[dict] = []  # oldest first
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def add_market(self, market_id: str, answers: list[tuple[str, str, float]],
+                   liquidity: float = DEFAULT_LIQUIDITY):
+        """Add a multiple-choice market from (answer_id, text, probability) rows."""
+        total = sum(p for _, _, p in answers) or 1.0
+        rows = []
+        for i, (aid, text, prob) in enumerate(answers):
+            pool_yes, pool_no = pools_for_prob(prob / total, liquidity)
+            rows.append({
+                "id": aid,
+                "contractId": market_id,
+                "index": i,
+                "text": text,
+                "poolYes": float(pool_yes),
+                "poolNo": float(pool_no),
+                "probability": pool_no / (pool_yes + pool_no),
+            })
+        self.markets[market_id] = {
+            "id": market_id,
+            "question": f"Fake market {market_id}",
+            "outcomeType": "MULTIPLE_CHOICE",
+            "mechanism": "cpmm-multi-1",
+            "shouldAnswersSumToOne": True,
+            "isResolved": False,
+            "answers": rows,
+        }
+
+    @classmethod
+    def from_preview(cls, path: Path = DATA_DIR / "bet_preview.json", **kwargs) -> "FakeManifold":
+        """Seed markets from a saved dry run (real IDs, texts and prices)."""
+        fake = cls(**kwargs)
+        with open(path) as f:
+            preview = json.load(f)
+        for market in preview["markets"].values():
+            fake.add_market(market["market_id"], [
+                (b["answer_id"], b["text"], b["market_prob"]) for b in market["buckets"]
+            ])
+        return fake
+
+    def get_market(self, market_id: str) -> dict:
+        with self.lock:
+            return json.loads(json.dumps(self.markets[market_id]))
+
+    def get_positions(self, market_id: str, user_id: str) -> list[dict]:
+        positions: dict[str, dict] = {}
+        with self.lock:
+            for bet in self.bets:
+                if bet["contractId"] != market_id or bet["userId"] != user_id:
+                    continue
+                pos = positions.setdefault(bet["answerId"], {
+                    "userId": user_id,
+                    "contractId": market_id,
+                    "answerId": bet["answerId"],
+                    "totalShares": {"YES": 0.0, "NO": 0.0},
+                    "invested": 0.0,
+                })
+                pos["totalShares"][bet["outcome"]] += bet["shares"]
+                pos["invested"] += bet["amount"]
+        for pos in positions.values():
+            pos["hasYesShares"] = pos["totalShares"]["YES"] > 0
+            pos["hasNoShares"] = pos["totalShares"]["NO"] > 0
+        return list(positions.values())
+
+    def list_bets(self, params: dict[str, str]) -> list[dict]:
+        """Bets newest first, filtered like the real /bets endpoint."""
+        limit = min(int(params.get("limit", 1000)), 1000)
+        with self.lock:
+            bets = list(reversed(self.bets))
+        if "contractId" in params:
+            bets = [b for b in bets if b["contractId"] == params["contractId"]]
+        if "userId" in params:
+            bets = [b for b in bets if b["userId"] == params["userId"]]
+        if "before" in params:
+            ids = [b["id"] for b in bets]
+            bets = bets[ids.index(params["before"]) + 1:] if params["before"] in ids else []
+        if "after" in params:
+            ids = [b["id"] for b in bets]
+            bets = bets[:ids.index(params["after"])] if params["after"] in ids else bets
+        return bets[:limit]
+
+    def place_bet(self, user_id: str, payload: dict) -> dict:
+        """Fill a bet against the answer's CPMM pool and move prices."""
+        market_id = payload["contractId"]
+        answer_id = payload["answerId"]
+        amount = float(payload["amount"])
+        outcome = payload.get("outcome", "YES")
+        if amount <= 0 or outcome not in ("YES", "NO"):
+            raise ValueError("Invalid bet")
+
+        with self.lock:
+            market = self.markets[market_id]
+            answer = next(a for a in market["answers"] if a["id"] == answer_id)
+            prob_before = answer["probability"]
+            shares, new_y, new_n = fill(answer["poolYes"], answer["poolNo"], amount, outcome == "YES")
+            shares = float(shares)
+            answer["poolYes"], answer["poolNo"] = float(new_y), float(new_n)
+            answer["probability"] = answer["poolNo"] / (answer["poolYes"] + answer["poolNo"])
+
+            # Keep sum-to-one by rescaling the other answers
+            others = [a for a in market["answers"] if a is not answer]
+            rest = sum(a["probability"] for a in others)
+            if rest > 0:
+                scale = (1 - answer["probability"]) / rest
+                for a in others:
+                    liquidity = math.sqrt(a["poolYes"] * a["poolNo"])
+                    pool_yes, pool_no = pools_for_prob(a["probability"] * scale, liquidity)
+                    a["poolYes"], a["poolNo"] = float(pool_yes), float(pool_no)
+                    a["probability"] = a["poolNo"] / (a["poolYes"] + a["poolNo"])
+
+            bet = {
+                "id": uuid.uuid4().hex[:12],
+                "userId": user_id,
+                "contractId": market_id,
+                "answerId": answer_id,
+                "amount": amount,
+                "shares": shares,
+                "outcome": outcome,
+                "probBefore": prob_before,
+                "probAfter": answer["probability"],
+                "createdTime": int(time.time() * 1000),
+                "isFilled": True,
+            }
+            self.bets.append(bet)
+        return bet
+
+    def delay(self):
+        """Sleep for the configured latency plus uniform jitter."""
+        seconds = (self.latency_ms + self.rng.uniform(0, self.jitter_ms)) / 1000
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def inject_error(self) -> bool:
+        return self.error_rate > 0 and self.rng.random() < self.error_rate
+
+
+def make_handler(fake: FakeManifold) -> type[BaseHTTPRequestHandler]:
+    """Build a request handler class bound to a FakeManifold instance."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            if len(data) > 1024 and "gzip" in self.headers.get("Accept-Encoding", ""):
+                data = gzip.compress(data, compresslevel=1)
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _user_id(self) -> str:
+            return self.headers.get("Authorization", "anonymous").split()[-1][:16]
+
+        def _route(self, method: str):
+            # Always drain the body so keep-alive connections stay in sync
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length) if length else b""
+            fake.delay()
+            if fake.inject_error():
+                self._send(fake.error_status, {"message": "Injected error"})
+                return
+
+            url = urlparse(self.path)
+            parts = [p for p in url.path.split("/") if p and p != "v0"]
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            try:
+                if method == "GET" and len(parts) == 2 and parts[0] == "market":
+                    self._send(200, fake.get_market(parts[1]))
+                elif method == "GET" and len(parts) == 3 and parts[0] == "market" and parts[2] == "positions":
+                    self._send(200, fake.get_positions(parts[1], params.get("userId", self._user_id())))
+                elif method == "GET" and parts == ["me"]:
+                    self._send(200, {"id": self._user_id(), "username": self._user_id()})
+                elif method == "GET" and parts == ["bets"]:
+                    self._send(200, fake.list_bets(params))
+                elif method == "POST" and parts == ["bet"]:
+                    payload = json.loads(body or b"{}")
+                    self._send(200, fake.place_bet(self._user_id(), payload))
+                else:
+                    self._send(404, {"message": f"Not found: {url.path}"})
+            except (KeyError, StopIteration):
+                self._send(404, {"message": "Market or answer not found"})
+            except ValueError as e:
+                self._send(400, {"message": str(e)})
+
+        def do_GET(self):
+            self._route("GET")
+
+        def do_POST(self):
+            self._route("POST")
+
+    return Handler
+
+
+def serve(fake: FakeManifold, host: str = "127.0.0.1", port: int = 0) -> tuple[ThreadingHTTPServer, str]:
+    """Start the fake server on a background thread.
+
+    Returns (server, base_url); call server.shutdown() to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v0"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake Manifold API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Base latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Extra uniform random latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status for injected errors")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    fake = FakeManifold.from_preview(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, error_status=args.error_status, seed=args.seed,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(fake))
+    print(f"Fake Manifold API on http://{args.host}:{args.port}/v0 ({len(fake.markets)} markets)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
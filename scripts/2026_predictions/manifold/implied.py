@@ -0,0 +1,188 @@
+"""Market-implied distributions fitted to bucket prices.
+
+Each market's bucket probabilities define a piecewise-uniform distribution
+over the finite buckets; its quantiles at IMPLIED_LEVELS are then fitted
+with a smooth family, for every market at once. Levels that fall inside an
+open-ended tail bucket ("< 5", "40+") are unknown and left out of that
+market's fit.
+
+Comparing the implied median and p10/p90 with a Prediction's gives the
+disagreement on the underlying quantity, which is much less noisy than
+individual bucket prices.
+"""
+
+from typing import Sequence
+
+import numpy as np
+from scipy.special import ndtri
+
+from .distributions import (
+    DistributionType, FittedDistribution, LogNormalDist, MetalogDist, NormalDist,
+    bucket_edges, fit_metalog_batch, fit_prediction,
+)
+
+
+IMPLIED_LEVELS = (0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95)
+
+
+def market_quantiles(
+    buckets: list[tuple[float | None, float | None]],
+    probs: np.ndarray,
+    levels: Sequence[float] = IMPLIED_LEVELS,
+) -> np.ndarray:
+    """Quantiles of the piecewise-uniform distribution given by bucket prices.
+
+    probs has shape (..., len(buckets)), one row per market sharing these
+    buckets, and is normalized to sum to one. Returns shape (..., len(levels)),
+    nan where a level falls in an unbounded bucket.
+    """
+    probs = np.asarray(probs, dtype=float)
+    levels = np.asarray(levels, dtype=float)
+    out_shape = probs.shape[:-1] + levels.shape
+    total = probs.sum(axis=-1, keepdims=True)
+    if len(buckets) == 0:
+        return np.full(out_shape, np.nan)
+    edges, _, upper_idx = bucket_edges(buckets)
+    finite = np.isfinite(edges)
+    if not finite.any():
+        return np.full(out_shape, np.nan)
+
+    # P(X <= edge) at each finite edge: bucket mass accumulates at its upper edge
+    mass_at = np.zeros((len(buckets), len(edges)))
+    mass_at[np.arange(len(buckets)), upper_idx] = 1.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cdf = np.cumsum((probs / total) @ mass_at, axis=-1)[..., finite]
+    x = edges[finite]
+
+    # For each level, the first edge whose cdf reaches it, then interpolate
+    # linearly from the previous edge (uniform mass within a bucket)
+    hi = (cdf[..., None, :] < levels[:, None]).sum(axis=-1)
+    lo = np.maximum(hi - 1, 0)
+    hi_c = np.take_along_axis(cdf, np.minimum(hi, len(x) - 1), axis=-1)
+    lo_c = np.take_along_axis(cdf, lo, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frac = np.where(hi > 0, (levels - lo_c) / (hi_c - lo_c), 1.0)
+        q = x[lo] + frac * (x[np.minimum(hi, len(x) - 1)] - x[lo])
+    beyond = (hi == len(x)) | ((hi == 0) & (hi_c > levels))
+    return np.where(beyond | ~np.isfinite(q), np.nan, q)
+
+
+def _masked_regression(y: np.ndarray, z: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Per-row least squares y = a + b * z over the finite entries of y.
+
+    Rows with fewer than two points or a non-positive slope get nan.
+    """
+    w = np.isfinite(y)
+    y0 = np.where(w, y, 0.0)
+    n = w.sum(axis=1)
+    sz = (w * z).sum(axis=1)
+    szz = (w * z * z).sum(axis=1)
+    sy = y0.sum(axis=1)
+    szy = (y0 * z).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = (n * szy - sz * sy) / (n * szz - sz * sz)
+        intercept = (sy - slope * sz) / n
+    bad = (n < 2) | ~(slope > 0)
+    return np.where(bad, np.nan, intercept), np.where(bad, np.nan, slope)
+
+
+def fit_implied_batch(
+    quantiles: np.ndarray,
+    dist_type: DistributionType = "normal",
+    levels: Sequence[float] = IMPLIED_LEVELS,
+) -> list[FittedDistribution | None]:
+    """Fit one distribution per row of quantiles (shape (n, len(levels))).
+
+    nan entries are skipped. Normal and log-normal fits are a single masked
+    regression on the normal scores of the levels; metalog rows sharing the
+    same known levels are fitted together. Rows that cannot be fitted give
+    None. truncated_normal is fitted as a normal.
+    """
+    quantiles = np.asarray(quantiles, dtype=float)
+    levels = np.asarray(levels, dtype=float)
+    n = len(quantiles)
+
+    if dist_type == "metalog":
+        out: list[FittedDistribution | None] = [None] * n
+        known = np.isfinite(quantiles)
+        patterns, groups = np.unique(known, axis=0, return_inverse=True)
+        for g, mask in enumerate(patterns):
+            rows = np.flatnonzero(groups.ravel() == g)
+            if mask.sum() < 2:
+                continue
+            try:
+                fit = fit_metalog_batch(levels[mask], quantiles[np.ix_(rows, mask)])
+            except ValueError:
+                continue
+            for row, a in zip(rows, fit.params["coefficients"]):
+                out[row] = FittedDistribution("metalog", {"coefficients": a}, MetalogDist(a))
+        return out
+
+    z = ndtri(levels)
+    if dist_type == "lognormal":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mu, sigma = _masked_regression(np.where(quantiles > 0, np.log(quantiles), np.nan), z)
+        return [
+            FittedDistribution("lognormal", {"mu": m, "sigma": s}, LogNormalDist(m, s))
+            if np.isfinite(m) else None
+            for m, s in zip(mu.tolist(), sigma.tolist())
+        ]
+
+    mean, sigma = _masked_regression(quantiles, z)
+    return [
+        FittedDistribution("normal", {"mean": m, "sigma": s}, NormalDist(m, s))
+        if np.isfinite(m) else None
+        for m, s in zip(mean.tolist(), sigma.tolist())
+    ]
+
+
+def fit_implied(
+    markets: Sequence[tuple[list[tuple[float | None, float | None]], Sequence[float]]],
+    dist_type: DistributionType = "normal",
+    levels: Sequence[float] = IMPLIED_LEVELS,
+) -> list[FittedDistribution | None]:
+    """Implied distribution for each (buckets, market_probs) pair."""
+    if not markets:
+        return []
+    # Markets with the same bucket layout share one vectorized quantile pass
+    layouts: dict[tuple, list[int]] = {}
+    for i, (buckets, _) in enumerate(markets):
+        layouts.setdefault(tuple(buckets), []).append(i)
+    quantiles = np.empty((len(markets), len(levels)))
+    for buckets, rows in layouts.items():
+        probs = np.array([markets[i][1] for i in rows], dtype=float).reshape(len(rows), len(buckets))
+        quantiles[rows] = market_quantiles(list(buckets), probs, levels)
+    return fit_implied_batch(quantiles, dist_type, levels)
+
+
+def attach_implied(market_results: dict[str, dict], predictions: dict) -> None:
+    """Add an "implied" summary to each process_market result, in place.
+
+    Each market is fitted with its prediction's family, one batch per
+    family. median_edge is our probability that the quantity lands above the
+    market-implied median, minus one half: positive means we expect higher
+    values than the market does.
+    """
+    families: dict[str, list[str]] = {}
+    for key in market_results:
+        dist_type = predictions[key].dist_type
+        families.setdefault("normal" if dist_type == "truncated_normal" else dist_type, []).append(key)
+
+    for dist_type, keys in families.items():
+        fits = fit_implied([
+            ([b[3] for b in market_results[k]["bucket_data"]], market_results[k]["market_probs"])
+            for k in keys
+        ], dist_type)
+        for key, dist in zip(keys, fits):
+            if dist is None:
+                market_results[key]["implied"] = None
+                continue
+            p10, median, p90 = (float(v) for v in dist.ppf(np.array([0.1, 0.5, 0.9])))
+            ours = fit_prediction(predictions[key])
+            market_results[key]["implied"] = {
+                "dist_type": dist_type,
+                "median": median,
+                "p10": p10,
+                "p90": p90,
+                "median_edge": 0.5 - ours.cdf(median),
+            }
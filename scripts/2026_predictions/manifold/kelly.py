@@ -1,6 +1,7 @@
 """Kelly criterion calculations for betting."""
 
 from dataclasses import dataclass
+from typing import Sequence
 import numpy as np
 
 from .config import KELLY_FRACTION, EDGE_THRESHOLD, MAX_POSITION_PCT, MIN_BET_SIZE
@@ -71,6 +72,84 @@ def calculate_market_edge(
     return float(edges.sum())
 
 
+# One row per sized bet; market/bucket index into the inputs of size_bets_batch
+BET_DTYPE = np.dtype([
+    ("market", np.int32),
+    ("bucket", np.int32),
+    ("our_prob", np.float64),
+    ("market_prob", np.float64),
+    ("edge", np.float64),
+    ("kelly_frac", np.float64),
+    ("bet_amount", np.float64),
+    ("outcome", "U3"),
+])
+
+
+def size_bets_batch(
+    our_probs: Sequence[np.ndarray],
+    market_probs: Sequence[np.ndarray],
+    allocations: Sequence[float],
+    kelly_mult: float = KELLY_FRACTION,
+    edge_threshold: float = EDGE_THRESHOLD,
+    max_position_pct: float = MAX_POSITION_PCT,
+    min_bet: float = MIN_BET_SIZE,
+) -> np.ndarray:
+    """Size bets for every bucket of every market in one vectorized pass.
+
+    Args:
+        our_probs: Per-market arrays of our bucket probabilities (ragged)
+        market_probs: Per-market arrays of market bucket probabilities
+        allocations: Mana allocated to each market
+        kelly_mult: Kelly fraction multiplier
+        edge_threshold: Minimum |our_prob - market_prob| to bet
+        max_position_pct: Max single bet as a fraction of allocation / KELLY_FRACTION
+            (the configured fraction, not kelly_mult, so the cap stays fixed
+            while a sweep varies kelly_mult)
+        min_bet: Bets smaller than this are dropped
+
+    Returns:
+        Structured array (BET_DTYPE) of bets that pass all filters, ordered by
+        market then bucket. edge is signed (our_prob - market_prob).
+    """
+    lengths = np.array([len(p) for p in our_probs], dtype=np.int64)
+    if lengths.sum() == 0:
+        return np.zeros(0, dtype=BET_DTYPE)
+
+    ours = np.concatenate([np.asarray(p, dtype=float) for p in our_probs])
+    mkts = np.concatenate([np.asarray(p, dtype=float) for p in market_probs])
+    alloc = np.repeat(np.asarray(allocations, dtype=float), lengths)
+    market_idx = np.repeat(np.arange(len(lengths), dtype=np.int32), lengths)
+    bucket_idx = np.arange(len(ours), dtype=np.int32) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    edge = ours - mkts
+    is_yes = edge > 0
+
+    # Same formulas as kelly_fraction_for_bet, guarding the degenerate prices
+    with np.errstate(divide="ignore", invalid="ignore"):
+        kelly = np.where(
+            is_yes,
+            np.where(mkts >= 1.0, 0.0, edge / (1 - mkts)),
+            np.where(mkts <= 0.0, 0.0, -edge / mkts),
+        ) * kelly_mult
+    kelly = np.maximum(kelly, 0.0)
+
+    max_bet = alloc * max_position_pct / KELLY_FRACTION  # Scale with allocation
+    bet_amount = np.minimum(kelly * alloc, max_bet)
+
+    keep = (np.abs(edge) >= edge_threshold) & (bet_amount >= min_bet)
+
+    bets = np.zeros(int(keep.sum()), dtype=BET_DTYPE)
+    bets["market"] = market_idx[keep]
+    bets["bucket"] = bucket_idx[keep]
+    bets["our_prob"] = ours[keep]
+    bets["market_prob"] = mkts[keep]
+    bets["edge"] = edge[keep]
+    bets["kelly_frac"] = kelly[keep]
+    bets["bet_amount"] = bet_amount[keep]
+    bets["outcome"] = np.where(is_yes[keep], "YES", "NO")
+    return bets
+
+
 def calculate_bets_for_market(
     answer_ids: list[str],
     answer_texts: list[str],
@@ -92,42 +171,20 @@ def calculate_bets_for_market(
     Returns:
         List of bet recommendations
     """
-    bets = []
-    max_bet = allocation * MAX_POSITION_PCT / KELLY_FRACTION  # Scale with allocation
-
-    for i, (aid, text) in enumerate(zip(answer_ids, answer_texts)):
-        our_p = our_probs[i]
-        mkt_p = market_probs[i]
-        edge = our_p - mkt_p
-
-        if abs(edge) < EDGE_THRESHOLD:
-            continue
-
-        if our_p > mkt_p:
-            # Bet YES on this bucket
-            outcome = "YES"
-            kelly = kelly_fraction_for_bet(our_p, mkt_p, kelly_mult)
-        else:
-            # Bet NO on this bucket
-            outcome = "NO"
-            kelly = kelly_fraction_for_bet(our_p, mkt_p, kelly_mult)
-            edge = -edge  # Make edge positive for display
-
-        bet_amount = min(kelly * allocation, max_bet)
-
-        if bet_amount >= MIN_BET_SIZE:
-            bets.append(BetRecommendation(
-                answer_id=aid,
-                answer_text=text,
-                our_prob=our_p,
-                market_prob=mkt_p,
-                edge=our_p - mkt_p,
-                kelly_frac=kelly,
-                bet_amount=bet_amount,
-                outcome=outcome,
-            ))
-
-    return bets
+    rows = size_bets_batch([our_probs], [market_probs], [allocation], kelly_mult=kelly_mult)
+    return [
+        BetRecommendation(
+            answer_id=answer_ids[row["bucket"]],
+            answer_text=answer_texts[row["bucket"]],
+            our_prob=float(row["our_prob"]),
+            market_prob=float(row["market_prob"]),
+            edge=float(row["edge"]),
+            kelly_frac=float(row["kelly_frac"]),
+            bet_amount=float(row["bet_amount"]),
+            outcome=str(row["outcome"]),
+        )
+        for row in rows
+    ]
 
 
 def allocate_bankroll(
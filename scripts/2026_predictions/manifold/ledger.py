@@ -0,0 +1,315 @@
+"""SQLite ledger of placed bets.
+
+Replaces appending to bet_history.csv: the executor commits each bet as
+it completes. Rows are indexed by market_key, answer_id and timestamp,
+and queried for positions, exposure and realized P&L without re-reading
+the whole history.
+
+Usage:
+    python -m manifold.ledger --import-csv      # one-shot import of bet_history.csv
+    python -m manifold.ledger --sync            # pull bets placed since the last sync
+    python -m manifold.ledger --positions
+    python -m manifold.ledger --exposure
+"""
+
+import argparse
+import csv
+import itertools
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable
+
+from .config import DATA_DIR, MARKET_ID_TO_KEY, BETS_PAGE_SIZE
+
+
+LEDGER_PATH = DATA_DIR / "ledger.sqlite"
+LEGACY_CSV_PATH = DATA_DIR / "bet_history.csv"
+
+COLUMNS = [
+    "timestamp", "market_id", "market_key", "answer_id", "answer_text", "outcome",
+    "amount", "our_prob", "market_prob", "edge", "status", "bet_id", "shares", "prob_after",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bets (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    market_id TEXT NOT NULL,
+    market_key TEXT NOT NULL,
+    answer_id TEXT NOT NULL,
+    answer_text TEXT,
+    outcome TEXT NOT NULL,
+    amount REAL NOT NULL,
+    our_prob REAL,
+    market_prob REAL,
+    edge REAL,
+    status TEXT NOT NULL,
+    bet_id TEXT UNIQUE,
+    shares REAL,
+    prob_after REAL,
+    UNIQUE (timestamp, answer_id, outcome)
+);
+-- The market_key index covers per-market bet queries without touching the table
+CREATE INDEX IF NOT EXISTS bets_market_key ON bets (market_key, status, answer_id, outcome, amount, shares);
+CREATE INDEX IF NOT EXISTS bets_answer_id ON bets (answer_id, status);
+CREATE INDEX IF NOT EXISTS bets_timestamp ON bets (timestamp);
+
+-- Running totals of successful bets, maintained in the same transaction as
+-- each insert, so position and exposure queries cost O(positions), not O(bets)
+CREATE TABLE IF NOT EXISTS positions (
+    market_key TEXT NOT NULL,
+    market_id TEXT NOT NULL,
+    answer_id TEXT NOT NULL,
+    answer_text TEXT,
+    outcome TEXT NOT NULL,
+    invested REAL NOT NULL,
+    shares REAL NOT NULL,
+    n_bets INTEGER NOT NULL,
+    PRIMARY KEY (market_key, answer_id, outcome)
+);
+CREATE TRIGGER IF NOT EXISTS bets_update_positions AFTER INSERT ON bets
+WHEN NEW.status = 'success'
+BEGIN
+    INSERT INTO positions VALUES (
+        NEW.market_key, NEW.market_id, NEW.answer_id, NEW.answer_text, NEW.outcome,
+        NEW.amount, COALESCE(NEW.shares, 0), 1
+    )
+    ON CONFLICT (market_key, answer_id, outcome) DO UPDATE SET
+        invested = invested + excluded.invested,
+        shares = shares + excluded.shares,
+        n_bets = n_bets + 1;
+END;
+
+-- Cursor for incremental syncs: the newest API bet id a completed sync saw
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+INSERT_SQL = (
+    f"INSERT OR IGNORE INTO bets ({', '.join(COLUMNS)}) "
+    f"VALUES ({', '.join(f':{c}' for c in COLUMNS)})"
+)
+
+# The oldest successful bet stored without an API id (imported from
+# bet_history.csv, or a fill response without one) that an API bet could be.
+# Stakes are compared loosely since the API may round them.
+BACKFILL_SQL = """
+UPDATE bets SET bet_id = :bet_id WHERE id = (
+    SELECT id FROM bets
+    WHERE bet_id IS NULL AND status = 'success' AND market_id = :market_id
+      AND answer_id = :answer_id AND outcome = :outcome AND ABS(amount - :amount) <= 0.5
+    ORDER BY timestamp LIMIT 1
+)
+"""
+
+
+def row_from_api(bet: dict) -> dict:
+    """Ledger row for a bet as returned by the /bets endpoint."""
+    return {
+        "timestamp": datetime.fromtimestamp(bet["createdTime"] / 1000).isoformat(),
+        "market_id": bet["contractId"],
+        "market_key": MARKET_ID_TO_KEY.get(bet["contractId"], bet["contractId"]),
+        "answer_id": bet.get("answerId") or "",
+        "answer_text": None,
+        "outcome": bet["outcome"],
+        "amount": bet["amount"],
+        "market_prob": bet.get("probBefore"),
+        "status": "success",
+        "bet_id": bet["id"],
+        "shares": bet.get("shares"),
+        "prob_after": bet.get("probAfter"),
+    }
+
+
+def estimate_shares(amount: float, market_prob: float, outcome: str) -> float | None:
+    """Shares bought at the quoted price, for rows without a fill record."""
+    price = market_prob if outcome == "YES" else 1 - market_prob
+    return amount / price if price > 0 else None
+
+
+class Ledger:
+    """Indexed store of placed bets."""
+
+    def __init__(self, path: Path | str = LEDGER_PATH):
+        self.path = path
+        if isinstance(path, Path):
+            path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def insert_many(self, rows: Iterable[dict]) -> int:
+        """Insert bet rows in one transaction; duplicates are skipped.
+
+        Returns the number of rows inserted.
+        """
+        with self.conn:
+            cursor = self.conn.executemany(INSERT_SQL, ({c: row.get(c) for c in COLUMNS} for row in rows))
+        return cursor.rowcount
+
+    def import_csv(self, path: Path = LEGACY_CSV_PATH) -> int:
+        """Import a bet_history.csv file (safe to re-run)."""
+        rows = []
+        with open(path, newline="") as f:
+            for rec in csv.DictReader(f):
+                amount = float(rec["amount"])
+                market_prob = float(rec["market_prob"])
+                rows.append({
+                    **rec,
+                    "amount": amount,
+                    "our_prob": float(rec["our_prob"]),
+                    "market_prob": market_prob,
+                    "edge": float(rec["edge"]),
+                    "status": rec["response"],
+                    "shares": estimate_shares(amount, market_prob, rec["outcome"]),
+                })
+        return self.insert_many(rows)
+
+    def newest_bet_id(self) -> str | None:
+        """API id of the newest bet seen by the last completed sync, if any."""
+        row = self.conn.execute("SELECT value FROM sync_state WHERE key = 'newest_bet_id'").fetchone()
+        return row["value"] if row else None
+
+    def merge_api_rows(self, rows: Iterable[dict]) -> int:
+        """Store row_from_api rows in one transaction; returns the number inserted.
+
+        A bet already stored under its id is skipped. One matching a stored
+        successful bet that has no id, by market, answer, outcome and stake,
+        gives that row its id instead of being inserted again, so positions
+        are never counted twice.
+        """
+        inserted = 0
+        with self.conn:
+            for row in rows:
+                if self.conn.execute("SELECT 1 FROM bets WHERE bet_id = ?", (row["bet_id"],)).fetchone():
+                    continue
+                if self.conn.execute(BACKFILL_SQL, row).rowcount:
+                    continue
+                inserted += self.conn.execute(INSERT_SQL, {c: row.get(c) for c in COLUMNS}).rowcount
+        return inserted
+
+    def sync(self, client, batch_size: int = BETS_PAGE_SIZE) -> int:
+        """Pull bets placed since the last sync from the API.
+
+        Bets are streamed from client.iter_my_bets and merged a batch at a
+        time, so a sync costs memory and requests in proportion to the new
+        bets only. The first sync walks the whole history. The cursor only
+        moves once a sync completes, and merging skips bets already stored,
+        so an interrupted sync is simply repeated. Returns the number of rows
+        inserted.
+        """
+        newest = None
+
+        def api_rows():
+            nonlocal newest
+            for bet in client.iter_my_bets(since_id=self.newest_bet_id()):
+                newest = newest or bet["id"]
+                if not bet.get("isCancelled") and bet.get("amount"):
+                    yield row_from_api(bet)
+
+        rows = api_rows()
+        inserted = 0
+        while batch := list(itertools.islice(rows, batch_size)):
+            inserted += self.merge_api_rows(batch)
+        if newest is not None:
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO sync_state (key, value) VALUES ('newest_bet_id', ?)", (newest,),
+                )
+        return inserted
+
+    def bets(
+        self,
+        market_key: str | None = None,
+        answer_id: str | None = None,
+        since: str | None = None,
+        until: str | None = None,
+        status: str | None = "success",
+    ) -> list[sqlite3.Row]:
+        """Bets matching the filters, oldest first. Timestamps are ISO strings."""
+        clauses, params = [], []
+        for column, op, value in (
+            ("market_key", "=", market_key), ("answer_id", "=", answer_id),
+            ("timestamp", ">=", since), ("timestamp", "<", until), ("status", "=", status),
+        ):
+            if value is not None:
+                clauses.append(f"{column} {op} ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self.conn.execute(f"SELECT * FROM bets {where} ORDER BY timestamp", params).fetchall()
+
+    def positions(self, market_key: str | None = None) -> list[sqlite3.Row]:
+        """Net position per (market_key, answer_id, outcome) from successful bets."""
+        where, params = ("WHERE market_key = ?", [market_key]) if market_key else ("", [])
+        return self.conn.execute(f"""
+            SELECT * FROM positions {where} ORDER BY market_key, answer_id, outcome
+        """, params).fetchall()
+
+    def exposure(self) -> dict[str, float]:
+        """Mana invested per market from successful bets."""
+        rows = self.conn.execute("""
+            SELECT market_key, SUM(invested) AS invested FROM positions
+            GROUP BY market_key ORDER BY market_key
+        """).fetchall()
+        return {row["market_key"]: row["invested"] for row in rows}
+
+    def realized_pnl(self, resolutions: dict[str, str]) -> dict[str, float]:
+        """P&L per resolved market.
+
+        resolutions maps market_key -> the answer_id that resolved YES. Each
+        share pays 1 mana: YES shares on the winning answer, NO shares on
+        every other answer. Read from the positions totals, so the cost is
+        per position, not per bet.
+        """
+        pnl = {}
+        for key, winner in resolutions.items():
+            row = self.conn.execute("""
+                SELECT SUM(invested) AS invested,
+                       SUM(CASE WHEN (outcome = 'YES') = (answer_id = ?) THEN shares ELSE 0 END) AS payout
+                FROM positions WHERE market_key = ?
+            """, (winner, key)).fetchone()
+            if row["invested"] is not None:
+                pnl[key] = (row["payout"] or 0.0) - row["invested"]
+        return pnl
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the bet ledger")
+    parser.add_argument("--ledger", type=Path, default=LEDGER_PATH)
+    parser.add_argument("--import-csv", nargs="?", const=LEGACY_CSV_PATH, type=Path, default=None,
+                        help="Import a bet_history.csv (default: the repo's)")
+    parser.add_argument("--sync", action="store_true", help="Pull bets placed since the last sync")
+    parser.add_argument("--api-base", default=None, help="API base URL (default: MANIFOLD_API_BASE)")
+    parser.add_argument("--positions", action="store_true", help="Show net positions")
+    parser.add_argument("--exposure", action="store_true", help="Show mana invested per market")
+    args = parser.parse_args()
+
+    ledger = Ledger(args.ledger)
+    if args.import_csv:
+        n = ledger.import_csv(args.import_csv)
+        print(f"Imported {n} new rows from {args.import_csv}")
+    if args.sync:
+        from .api import ManifoldClient
+        from .config import MANIFOLD_API_BASE
+
+        n = ledger.sync(ManifoldClient(base_url=args.api_base or MANIFOLD_API_BASE))
+        print(f"Synced {n} new bets")
+    if args.positions:
+        for row in ledger.positions():
+            print(f"  {row['market_key']:<24} {(row['answer_text'] or '')[:20]:<20} {row['outcome']:<3} "
+                  f"{row['invested']:8.0f} mana  {row['shares'] or 0:8.0f} shares  ({row['n_bets']} bets)")
+    if args.exposure:
+        for key, invested in ledger.exposure().items():
+            print(f"  {key:<24} {invested:8.0f} mana")
+    ledger.close()
+
+
+if __name__ == "__main__":
+    main()
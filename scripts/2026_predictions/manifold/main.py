@@ -1,60 +1,138 @@
 #!/usr/bin/env python3
 """Main orchestration for Kelly betting on Manifold Markets."""
 
+from __future__ import annotations
+
 import argparse
 import json
-import csv
+import time
 from datetime import datetime
 from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
-import numpy as np
-
-from .api import ManifoldClient, parse_bucket_boundaries
-from .config import MARKET_IDS, TOTAL_BANKROLL, KELLY_FRACTION, EDGE_THRESHOLD
-from .distributions import fit_distribution, compute_bucket_probs
-from .kelly import calculate_bets_for_market, calculate_market_edge, allocate_bankroll, BetRecommendation
-from .predictions import PREDICTIONS, Prediction
+from .config import (
+    MARKET_IDS, TOTAL_BANKROLL, KELLY_FRACTION, EDGE_THRESHOLD, FETCH_WORKERS, REQUEST_TIMEOUT, MIN_BET_SIZE,
+    MAX_POSITION_PCT, CACHE_MAX_STALENESS, DATA_DIR, MANIFOLD_API_BASE, BET_RATE_PER_SEC,
+    WATCH_MIN_INTERVAL, WATCH_MAX_INTERVAL, WATCH_PRICE_THRESHOLD, COPULA,
+)
+from .profiling import TIMER, profile_to
 
+# Everything beyond config is imported inside the functions that use it, so
+# --help and argument errors don't pay for loading numpy, scipy and requests
+if TYPE_CHECKING:
+    import numpy as np
 
-DATA_DIR = Path(__file__).parent.parent.parent.parent / "data" / "2026_predictions" / "manifold"
+    from .api import ManifoldClient
+    from .ledger import Ledger
+    from .predictions import Prediction
+    from .snapshots import SnapshotStore
 
 
-def fetch_market_data(client: ManifoldClient, market_id: str) -> dict:
+def fetch_market_data(client: ManifoldClient, market_id: str, timeout: float = REQUEST_TIMEOUT) -> dict:
     """Fetch and parse market data from Manifold."""
-    market = client.get_market(market_id)
+    market = client.get_market(market_id, timeout=timeout)
     return market
 
 
+def fetch_concurrently(
+    fetch,
+    items: dict[str, str],
+    max_workers: int = FETCH_WORKERS,
+) -> dict[str, Any]:
+    """Call fetch(value) for every item on a bounded thread pool.
+
+    Returns dict of key -> result, or the exception raised for that key (one
+    failing request does not affect the others).
+    """
+    results: dict[str, Any] = {}
+    if not items:
+        return results
+
+    workers = max(1, min(max_workers, len(items)))
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fetch, value): key for key, value in items.items()}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                results[key] = e
+
+    return results
+
+
+def fetch_markets(
+    client: ManifoldClient,
+    market_ids: dict[str, str],
+    max_workers: int = FETCH_WORKERS,
+    timeout: float = REQUEST_TIMEOUT,
+    store: SnapshotStore | None = None,
+) -> dict[str, dict | Exception]:
+    """Fetch all market snapshots concurrently.
+
+    Each request runs on a bounded thread pool with its own timeout, so total
+    wall-clock time is roughly that of the slowest single request. With a
+    store, every fetched payload is recorded for later replay.
+
+    Returns dict of prediction_key -> market payload, or the exception raised
+    while fetching it.
+    """
+    results = fetch_concurrently(
+        lambda market_id: fetch_market_data(client, market_id, timeout), market_ids, max_workers,
+    )
+    if store is not None:
+        store.record({
+            market_ids[key]: market for key, market in results.items()
+            if not isinstance(market, Exception)
+        })
+    return results
+
+
+def fetch_positions(
+    client: ManifoldClient,
+    market_ids: dict[str, str],
+    user_id: str,
+    max_workers: int = FETCH_WORKERS,
+    timeout: float = REQUEST_TIMEOUT,
+) -> dict[str, list[dict] | Exception]:
+    """Fetch our positions in every market concurrently (see fetch_markets)."""
+    return fetch_concurrently(
+        lambda market_id: client.get_market_positions(market_id, user_id=user_id, timeout=timeout),
+        market_ids, max_workers,
+    )
+
+
 def parse_market_buckets(market: dict, prediction_key: str) -> list[tuple[str, str, float, tuple[float | None, float | None]]]:
     """Parse market answers into bucket data.
 
     Returns list of (answer_id, answer_text, market_prob, (lower, upper))
     """
-    answers = market.get("answers", [])
-    buckets = []
+    from .parsing import parse_many
 
-    for ans in answers:
-        aid = ans["id"]
-        text = ans.get("text", "")
-        prob = ans.get("probability", 0.0)
-        bounds = parse_bucket_boundaries(text, prediction_key)
-        buckets.append((aid, text, prob, bounds))
+    answers = market.get("answers", [])
+    texts = [ans.get("text", "") for ans in answers]
+    all_bounds = parse_many(texts, prediction_key)
 
-    return buckets
+    return [
+        (ans["id"], text, ans.get("probability", 0.0), bounds)
+        for ans, text, bounds in zip(answers, texts, all_bounds)
+    ]
 
 
 def process_market(
-    client: ManifoldClient,
+    market: dict,
     prediction_key: str,
     prediction: Prediction,
     verbose: bool = True,
+    market_id: str | None = None,
 ) -> dict:
-    """Process a single market and calculate bets.
+    """Process a single (already fetched) market and calculate bets.
 
     Returns dict with market info, our probs, market probs, and recommended bets.
     """
-    market_id = MARKET_IDS[prediction_key]
-    market = fetch_market_data(client, market_id)
+    market_id = market_id or MARKET_IDS[prediction_key]
 
     if verbose:
         print(f"\n{'='*60}")
@@ -63,27 +141,32 @@ def process_market(
         print(f"Our prediction: {prediction.median} ({prediction.p10}, {prediction.p90}) {prediction.unit}")
 
     # Parse buckets from market
-    bucket_data = parse_market_buckets(market, prediction_key)
+    with TIMER.span("parse"):
+        bucket_data = parse_market_buckets(market, prediction_key)
 
     if verbose:
         print(f"\nMarket buckets ({len(bucket_data)}):")
         for aid, text, prob, bounds in bucket_data:
             print(f"  {text}: {prob:.1%} (bounds: {bounds})")
 
+    # Deferred imports (see top of module); the first market pays for scipy
+    with TIMER.span("imports"):
+        import numpy as np
+
+        from .cpmm import pools_from_market
+        from .distributions import compute_bucket_probs, fit_prediction
+        from .kelly import calculate_market_edge
+
     # Fit our distribution
-    dist = fit_distribution(
-        median=prediction.median,
-        p10=prediction.p10,
-        p90=prediction.p90,
-        dist_type=prediction.dist_type,
-        lower_bound=prediction.lower_bound,
-        upper_bound=prediction.upper_bound,
-    )
+    with TIMER.span("fit"):
+        dist = fit_prediction(prediction)
 
     # Extract bounds for bucket probability calculation
-    bucket_bounds = [b[3] for b in bucket_data]
-    our_probs = compute_bucket_probs(dist, bucket_bounds)
-    market_probs = np.array([b[2] for b in bucket_data])
+    with TIMER.span("bucket_probs"):
+        bucket_bounds = [b[3] for b in bucket_data]
+        our_probs = compute_bucket_probs(dist, bucket_bounds)
+        market_probs = np.array([b[2] for b in bucket_data])
+        pool_yes, pool_no = pools_from_market(market)
 
     if verbose:
         print(f"\nProbability comparison:")
@@ -96,7 +179,8 @@ def process_market(
             print(f"  {text[:25]:<25} {our_p:.1%}    {mkt_p:.1%}    {edge_str}")
 
     # Calculate expected edge for this market
-    market_edge = calculate_market_edge(our_probs, market_probs)
+    with TIMER.span("edge"):
+        market_edge = calculate_market_edge(our_probs, market_probs)
 
     return {
         "prediction_key": prediction_key,
@@ -106,47 +190,217 @@ def process_market(
         "bucket_data": bucket_data,
         "our_probs": our_probs,
         "market_probs": market_probs,
+        "pool_yes": pool_yes,
+        "pool_no": pool_no,
         "market_edge": market_edge,
         "distribution": {
             "type": prediction.dist_type,
             "median": prediction.median,
             "p10": prediction.p10,
             "p90": prediction.p90,
+            **({"quantiles": prediction.quantiles} if prediction.quantiles else {}),
         },
     }
 
 
-def run_dry_run(verbose: bool = True, bankroll: float = TOTAL_BANKROLL) -> dict:
-    """Run dry-run analysis for all markets.
+def size_markets(
+    market_results: dict[str, dict],
+    allocations: dict[str, float],
+    sizing: str = "greedy",
+    slippage: bool = True,
+    kelly_mult: float = KELLY_FRACTION,
+    edge_threshold: float = EDGE_THRESHOLD,
+    max_position_pct: float = MAX_POSITION_PCT,
+) -> np.ndarray:
+    """Size bets for every bucket of every processed market in one batch.
 
-    Returns dict with all market analyses and bet recommendations.
+    Returns a BET_DTYPE array; its market index follows market_results order.
     """
-    client = ManifoldClient()
+    from .cpmm import size_bets_slippage
+    from .joint_kelly import size_bets_joint
+    from .kelly import size_bets_batch
+
+    results = list(market_results.values())
+    batch = dict(
+        our_probs=[r["our_probs"] for r in results],
+        market_probs=[r["market_probs"] for r in results],
+        allocations=[allocations[k] for k in market_results],
+        kelly_mult=kelly_mult,
+        edge_threshold=edge_threshold,
+        max_position_pct=max_position_pct,
+    )
+    if sizing == "joint":
+        return size_bets_joint(**batch)
+    if slippage:
+        return size_bets_slippage(
+            **batch,
+            pool_yes=[r["pool_yes"] for r in results],
+            pool_no=[r["pool_no"] for r in results],
+        )
+    return size_bets_batch(**batch)
 
-    print(f"Kelly Betting Dry Run")
-    print(f"Bankroll: {bankroll} mana")
-    print(f"Kelly fraction: {KELLY_FRACTION}")
-    print(f"Edge threshold: {EDGE_THRESHOLD:.0%}")
+
+def size_all_bets(
+    market_results: dict[str, dict],
+    allocations: dict[str, float],
+    sizing: str = "greedy",
+    slippage: bool = True,
+) -> list[dict]:
+    """Size bets for every processed market (see size_markets).
+
+    Returns bet dicts (market info plus BetRecommendation fields), ordered by
+    market then bucket.
+    """
+    result_list = list(market_results.items())
+    sized = size_markets(market_results, allocations, sizing=sizing, slippage=slippage)
+
+    all_bets = []
+    for row in sized:
+        pred_key, result = result_list[row["market"]]
+        aid, text, _, _ = result["bucket_data"][row["bucket"]]
+        all_bets.append({
+            "market_key": pred_key,
+            "market_id": result["market_id"],
+            "market_name": result["market_name"],
+            "answer_id": aid,
+            "answer_text": text,
+            "our_prob": float(row["our_prob"]),
+            "market_prob": float(row["market_prob"]),
+            "edge": float(row["edge"]),
+            "kelly_frac": float(row["kelly_frac"]),
+            "bet_amount": float(row["bet_amount"]),
+            "outcome": str(row["outcome"]),
+        })
+    return all_bets
+
+
+def analyze_markets(
+    client: ManifoldClient,
+    predictions: dict[str, Prediction],
+    market_ids: dict[str, str],
+    verbose: bool = True,
+    store: SnapshotStore | None = None,
+) -> dict[str, dict]:
+    """Fetch every predicted market once and run process_market on it.
+
+    Markets that are not configured, fail to fetch or fail to process are
+    reported and left out. Returns prediction_key -> process_market result.
+    """
+    # Fetch all market snapshots up front, in parallel
+    to_fetch = {}
+    for pred_key in predictions:
+        if pred_key not in market_ids:
+            print(f"\nSkipping {pred_key}: No market ID configured")
+            continue
+        to_fetch[pred_key] = market_ids[pred_key]
+
+    with TIMER.span("fetch"):
+        markets = fetch_markets(client, to_fetch, store=store)
 
     # Process all markets
     market_results = {}
-    market_edges = {}
 
-    for pred_key, prediction in PREDICTIONS.items():
-        if pred_key not in MARKET_IDS:
-            print(f"\nSkipping {pred_key}: No market ID configured")
+    for pred_key in to_fetch:
+        prediction = predictions[pred_key]
+        market = markets[pred_key]
+        if isinstance(market, Exception):
+            print(f"\nError fetching {pred_key}: {market}")
             continue
 
         try:
-            result = process_market(client, pred_key, prediction, verbose=verbose)
+            result = process_market(market, pred_key, prediction, verbose=verbose, market_id=to_fetch[pred_key])
             market_results[pred_key] = result
-            market_edges[pred_key] = result["market_edge"]
         except Exception as e:
             print(f"\nError processing {pred_key}: {e}")
+
+    return market_results
+
+
+def run_dry_run(
+    verbose: bool = True,
+    bankroll: float = TOTAL_BANKROLL,
+    max_staleness: float | None = CACHE_MAX_STALENESS,
+    client: ManifoldClient | None = None,
+    predictions: dict[str, Prediction] | None = None,
+    market_ids: dict[str, str] | None = None,
+    sizing: str = "greedy",
+    slippage: bool = True,
+    store: SnapshotStore | None = None,
+    allocation: str = "edge",
+    copula: str = COPULA,
+    risk: bool = True,
+    market_results: dict[str, dict] | None = None,
+) -> dict:
+    """Run dry-run analysis for all markets.
+
+    max_staleness is how old (in seconds) a cached market response may be
+    before it is revalidated against the API; None disables the cache.
+    client, predictions and market_ids default to the live API and the
+    configured markets; benchmarks pass a fake-server client and synthetic
+    markets instead. sizing is "greedy" (independent per-bucket Kelly) or
+    "joint" (joint Kelly over each market's mutually exclusive buckets).
+    With slippage, greedy stakes account for price impact along each
+    answer's CPMM pool, using the pool state in the market payload. With a
+    store, fetched payloads are recorded; pass a snapshots.ReplayClient as
+    client to run against a recorded snapshot instead of the API.
+    allocation is "edge" (bankroll split by market edge) or "copula"
+    (maximize expected log growth over correlated joint outcomes, see
+    manifold.portfolio). With risk, the recommended bets' growth and P&L
+    distribution over correlated outcomes are reported. Passing
+    market_results (process_market results, as manifold.daemon keeps them)
+    skips fetching and processing.
+
+    Returns dict with all market analyses and bet recommendations.
+    """
+    from .api import ManifoldClient, ResponseCache
+    from .implied import attach_implied
+    from .kelly import allocate_bankroll
+    from .predictions import PREDICTIONS
+
+    if client is None and market_results is None:
+        cache = ResponseCache(max_staleness=max_staleness) if max_staleness is not None else None
+        client = ManifoldClient(cache=cache)
+    predictions = PREDICTIONS if predictions is None else predictions
+    market_ids = MARKET_IDS if market_ids is None else market_ids
+
+    print(f"Kelly Betting Dry Run")
+    print(f"Bankroll: {bankroll} mana")
+    print(f"Kelly fraction: {KELLY_FRACTION}")
+    print(f"Edge threshold: {EDGE_THRESHOLD:.0%}")
+    print(f"Sizing: {sizing}{' (slippage-aware)' if slippage and sizing == 'greedy' else ''}")
+
+    if market_results is None:
+        market_results = analyze_markets(client, predictions, market_ids, verbose=verbose, store=store)
+    market_edges = {k: r["market_edge"] for k, r in market_results.items()}
+
+    with TIMER.span("implied"):
+        attach_implied(market_results, predictions)
+
+    print(f"\n{'='*60}")
+    print("MARKET-IMPLIED vs OUR DISTRIBUTIONS (median, p10-p90)")
+    print(f"{'='*60}")
+    for pred_key, result in market_results.items():
+        implied = result["implied"]
+        ours = result["distribution"]
+        if implied is None:
+            print(f"  {pred_key}: market too coarse to fit")
             continue
+        print(f"  {pred_key}: market {implied['median']:.3g} ({implied['p10']:.3g}-{implied['p90']:.3g}), "
+              f"ours {ours['median']:.3g} ({ours['p10']:.3g}-{ours['p90']:.3g}), "
+              f"median edge {implied['median_edge']:+.1%}")
 
     # Allocate bankroll
-    allocations = allocate_bankroll(market_edges, bankroll)
+    with TIMER.span("allocate"):
+        allocations = allocate_bankroll(market_edges, bankroll)
+
+    model = None
+    if market_results and (allocation == "copula" or risk):
+        from .portfolio import build_model
+
+        with TIMER.span("portfolio"):
+            model = build_model(market_results, copula=copula)
+            if allocation == "copula":
+                allocations = model.allocate(bankroll, start=allocations)
 
     print(f"\n{'='*60}")
     print("BANKROLL ALLOCATION")
@@ -155,30 +409,8 @@ def run_dry_run(verbose: bool = True, bankroll: float = TOTAL_BANKROLL) -> dict:
         edge = market_edges.get(pred_key, 0)
         print(f"  {pred_key}: {alloc:.0f} mana (edge: {edge:.3f})")
 
-    # Calculate bets for each market
-    all_bets = []
-    for pred_key, result in market_results.items():
-        allocation = allocations[pred_key]
-
-        answer_ids = [b[0] for b in result["bucket_data"]]
-        answer_texts = [b[1] for b in result["bucket_data"]]
-
-        bets = calculate_bets_for_market(
-            answer_ids=answer_ids,
-            answer_texts=answer_texts,
-            our_probs=result["our_probs"],
-            market_probs=result["market_probs"],
-            allocation=allocation,
-        )
-
-        for bet in bets:
-            bet_info = {
-                "market_key": pred_key,
-                "market_id": result["market_id"],
-                "market_name": result["market_name"],
-                **vars(bet),
-            }
-            all_bets.append(bet_info)
+    with TIMER.span("sizing"):
+        all_bets = size_all_bets(market_results, allocations, sizing=sizing, slippage=slippage)
 
     # Sort bets by absolute edge
     all_bets.sort(key=lambda x: -abs(x["edge"]))
@@ -201,6 +433,18 @@ def run_dry_run(verbose: bool = True, bankroll: float = TOTAL_BANKROLL) -> dict:
     print(f"TOTAL: {total_bet:.0f} mana across {len([b for b in all_bets if b['bet_amount'] >= 1])} bets")
     print(f"{'='*60}")
 
+    portfolio = None
+    if model is not None:
+        from .portfolio import bet_payoffs
+
+        with TIMER.span("portfolio"):
+            stats = model.stats(bet_payoffs(market_results, all_bets), bankroll)
+        portfolio = {"copula": copula, "samples": model.buckets.shape[1], **stats}
+        print(f"\nPortfolio ({copula} copula, {model.buckets.shape[1]:,} joint outcomes): "
+              f"E[log growth] {stats['expected_log_growth']:+.4f}, "
+              f"E[profit] {stats['expected_profit']:+.0f}, sd {stats['std_profit']:.0f}, "
+              f"p5 {stats['p5_profit']:+.0f}, P(loss) {stats['prob_loss']:.1%}")
+
     # Prepare output
     output = {
         "timestamp": datetime.now().isoformat(),
@@ -208,12 +452,17 @@ def run_dry_run(verbose: bool = True, bankroll: float = TOTAL_BANKROLL) -> dict:
             "bankroll": bankroll,
             "kelly_fraction": KELLY_FRACTION,
             "edge_threshold": EDGE_THRESHOLD,
+            "sizing": sizing,
+            "slippage": slippage,
+            "allocation": allocation,
         },
         "allocations": allocations,
+        "portfolio": portfolio,
         "markets": {k: {
             "market_id": v["market_id"],
             "market_edge": v["market_edge"],
             "distribution": v["distribution"],
+            "implied": v["implied"],
             "buckets": [
                 {
                     "answer_id": b[0],
@@ -231,81 +480,295 @@ def run_dry_run(verbose: bool = True, bankroll: float = TOTAL_BANKROLL) -> dict:
     return output
 
 
+def json_default(obj):
+    """json.dumps default for the numpy values in dry-run output."""
+    import numpy as np
+
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (np.floating, np.integer)):
+        return float(obj)
+    return obj
+
+
 def save_dry_run(output: dict):
-    """Save dry-run output to JSON file."""
+    """Save dry-run output to JSON file.
+
+    When stage timing is enabled, the timings (including this serialization)
+    are saved under "timings".
+    """
     DATA_DIR.mkdir(parents=True, exist_ok=True)
     output_path = DATA_DIR / "bet_preview.json"
 
-    # Convert numpy types for JSON serialization
-    def convert(obj):
-        if isinstance(obj, np.ndarray):
-            return obj.tolist()
-        if isinstance(obj, (np.floating, np.integer)):
-            return float(obj)
-        return obj
-
+    with TIMER.span("serialize"):
+        text = json.dumps(output, indent=2, default=json_default)
+    if TIMER.enabled:
+        text = json.dumps({**output, "timings": TIMER.as_dict()}, indent=2, default=json_default)
     with open(output_path, "w") as f:
-        json.dump(output, f, indent=2, default=convert)
+        f.write(text)
 
     print(f"\nDry-run saved to: {output_path}")
 
 
-def execute_bets(bets: list[dict], confirm: bool = False):
-    """Execute the recommended bets."""
-    if not confirm:
-        print("\nTo execute bets, run with --execute --confirm")
-        return
-
-    client = ManifoldClient()
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    history_path = DATA_DIR / "bet_history.csv"
+def rebalance_bets(
+    bets: list[dict],
+    positions: dict[str, list[dict] | Exception],
+    markets: dict[str, dict | Exception],
+    min_bet: float = MIN_BET_SIZE,
+) -> list[dict]:
+    """Turn target bets into the orders that top current holdings up to target.
+
+    positions and markets map market_key -> our positions in that market and
+    its freshly fetched payload (or the error raised fetching them). Shares
+    already held on a bet's answer and outcome are valued at the answer's
+    current probability, which includes the impact of bets we already
+    placed, and the order is the remaining stake, dropped below min_bet.
+    Holdings above target are left alone, as reducing them would mean
+    selling. Markets whose positions or prices are unknown get no orders
+    rather than risk stacking bets.
+    """
+    held: dict[tuple[str, str], float] = {}
+    for rows in positions.values():
+        if isinstance(rows, Exception):
+            continue
+        for pos in rows:
+            if not pos.get("answerId"):
+                continue
+            for outcome, shares in (pos.get("totalShares") or {}).items():
+                key = (pos["answerId"], outcome)
+                held[key] = held.get(key, 0.0) + shares
+
+    orders = []
+    for bet in bets:
+        market = markets.get(bet["market_key"], KeyError())
+        if isinstance(positions.get(bet["market_key"], KeyError()), Exception) or isinstance(market, Exception):
+            continue
+        prob = answer_probs(market).get(bet["answer_id"], bet["market_prob"])
+        price = prob if bet["outcome"] == "YES" else 1 - prob
+        held_value = held.get((bet["answer_id"], bet["outcome"]), 0.0) * price
+        delta = bet["bet_amount"] - held_value
+        if delta >= min_bet:
+            orders.append({**bet, "target_amount": bet["bet_amount"], "held_value": held_value, "bet_amount": delta})
+    return orders
 
-    # Check if history file exists
-    write_header = not history_path.exists()
 
-    with open(history_path, "a", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=[
-            "timestamp", "market_id", "market_key", "answer_id", "answer_text",
-            "outcome", "amount", "our_prob", "market_prob", "edge", "response",
-        ])
-        if write_header:
-            writer.writeheader()
+def rebalance(output: dict, client: ManifoldClient) -> dict:
+    """Replace a dry run's target bets with delta orders against our positions.
 
-        for bet in bets:
-            if bet["bet_amount"] < 1:
-                continue
+    Positions and current prices for every market with a target bet are
+    fetched concurrently.
+    """
+    user_id = client.get_me()["id"]
+    targeted = {b["market_key"] for b in output["bets"] if b["bet_amount"] >= 1}
+    market_ids = {k: m["market_id"] for k, m in output["markets"].items() if k in targeted}
+    with TIMER.span("positions"):
+        positions = fetch_positions(client, market_ids, user_id)
+        markets = fetch_markets(client, market_ids)
+    for key in market_ids:
+        for what, fetched in (("positions", positions), ("prices", markets)):
+            if isinstance(fetched[key], Exception):
+                print(f"\nError fetching {what} for {key}: {fetched[key]} (no orders for this market)")
+
+    orders = rebalance_bets(output["bets"], positions, markets)
+    orders.sort(key=lambda x: -abs(x["edge"]))
+    target = sum(b["bet_amount"] for b in output["bets"] if b["bet_amount"] >= 1)
+    total = sum(o["bet_amount"] for o in orders)
 
-            print(f"\nPlacing bet: {bet['outcome']} {bet['bet_amount']:.0f} on {bet['answer_text']}")
+    print(f"\n{'='*60}")
+    print("REBALANCE ORDERS")
+    print(f"{'='*60}")
+    for order in orders:
+        print(f"  {order['market_name']}: {order['outcome']} {order['bet_amount']:.0f} on {order['answer_text']} "
+              f"(target {order['target_amount']:.0f}, held {order['held_value']:.0f})")
+    print(f"\nTarget {target:.0f} mana; {total:.0f} mana left to place across {len(orders)} orders")
+    return {**output, "target_bets": output["bets"], "bets": orders, "total_bet": total}
+
+
+def execute_bets(
+    bets: list[dict],
+    confirm: bool = False,
+    client: ManifoldClient | None = None,
+    ledger: Ledger | None = None,
+    rate_limit: float = BET_RATE_PER_SEC,
+):
+    """Execute the recommended bets.
+
+    Each result is committed to the bet ledger as soon as it completes, so
+    an interrupted run still records every bet that was placed.
+    """
+    if not confirm:
+        print("\nTo execute bets, run with --execute --confirm")
+        return
 
+    from .api import ManifoldClient
+    from .executor import TokenBucket, place_bets
+    from .ledger import Ledger
+
+    client = client or ManifoldClient()
+    ledger = ledger or Ledger()
+
+    to_place = [bet for bet in bets if bet["bet_amount"] >= 1]
+    for bet in to_place:
+        print(f"Queueing bet: {bet['outcome']} {bet['bet_amount']:.0f} on {bet['answer_text']}")
+
+    # Rows are recorded as bets complete, not in submission order
+    for bet, response, status in place_bets(client, to_place, limiter=TokenBucket(rate_limit)):
+        if status == "success":
+            print(f"\nPlaced {bet['outcome']} {bet['bet_amount']:.0f} on {bet['answer_text']}")
+            print(f"  Success: {response}")
+        else:
+            print(f"\nFailed {bet['outcome']} {bet['bet_amount']:.0f} on {bet['answer_text']}")
+            print(f"  Error: {response}")
+
+        fill = response if isinstance(response, dict) else {}
+        ledger.insert_many([{
+            "timestamp": datetime.now().isoformat(),
+            "market_id": bet["market_id"],
+            "market_key": bet["market_key"],
+            "answer_id": bet["answer_id"],
+            "answer_text": bet["answer_text"],
+            "outcome": bet["outcome"],
+            # place_bet sends whole mana; prefer the amount the API filled
+            "amount": fill.get("amount", int(bet["bet_amount"])),
+            "our_prob": bet["our_prob"],
+            "market_prob": bet["market_prob"],
+            "edge": bet["edge"],
+            "status": status,
+            "bet_id": fill.get("betId") or fill.get("id"),
+            "shares": fill.get("shares"),
+            "prob_after": fill.get("probAfter"),
+        }])
+
+    print(f"\nBet history saved to: {ledger.path}")
+
+
+def answer_probs(market: dict) -> dict[str, float]:
+    """Map answer_id -> probability for a market payload."""
+    return {ans["id"]: ans.get("probability", 0.0) for ans in market.get("answers", [])}
+
+
+def price_moved(old: dict[str, float], new: dict[str, float], threshold: float) -> bool:
+    """Whether any answer moved by at least threshold (or answers changed)."""
+    if old.keys() != new.keys():
+        return True
+    return any(abs(new[aid] - old[aid]) >= threshold for aid in new)
+
+
+def refresh_predictions() -> bool:
+    """Reload predictions.py if it was edited, dropping caches derived from it."""
+    from .distributions import fit_cached
+    from .parsing import parse_bucket_boundaries, parser_chain
+    from .predictions import reload_if_changed
+
+    if not reload_if_changed():
+        return False
+
+    fit_cached.cache_clear()
+    parser_chain.cache_clear()
+    parse_bucket_boundaries.cache_clear()
+    return True
+
+
+def watch(
+    client: ManifoldClient,
+    bankroll: float = TOTAL_BANKROLL,
+    sizing: str = "greedy",
+    slippage: bool = True,
+    threshold: float = WATCH_PRICE_THRESHOLD,
+    min_interval: float = WATCH_MIN_INTERVAL,
+    max_interval: float = WATCH_MAX_INTERVAL,
+    max_cycles: int | None = None,
+    predictions: dict[str, Prediction] | None = None,
+    market_ids: dict[str, str] | None = None,
+    store: SnapshotStore | None = None,
+):
+    """Poll markets and re-evaluate only those whose prices moved.
+
+    Each market has its own polling interval: it halves (down to
+    min_interval) after a poll that moved prices past threshold and grows
+    1.5x (up to max_interval) after a quiet one, so API calls track market
+    activity. Only moved markets go back through process_market; the
+    allocation and sizing steps then rerun over the cached results, and
+    recommendations for the moved markets are printed.
+
+    When watching the default PREDICTIONS, edits to predictions.py are picked
+    up between cycles and every market is re-evaluated on its next poll.
+    """
+    from .kelly import allocate_bankroll
+    from .predictions import PREDICTIONS
+
+    reloadable = predictions is None
+    predictions = PREDICTIONS if predictions is None else predictions
+    market_ids = MARKET_IDS if market_ids is None else market_ids
+    keys = [k for k in predictions if k in market_ids]
+
+    last_probs: dict[str, dict[str, float]] = {}
+    results: dict[str, dict] = {}
+    interval = {k: min_interval for k in keys}
+    next_poll = {k: 0.0 for k in keys}
+
+    print(f"Watching {len(keys)} markets (threshold {threshold:.1%}, "
+          f"interval {min_interval:.0f}-{max_interval:.0f}s). Ctrl-C to stop.")
+    cycle = 0
+    try:
+        while max_cycles is None or cycle < max_cycles:
+            cycle += 1
+            now = time.monotonic()
             try:
-                response = client.place_bet(
-                    market_id=bet["market_id"],
-                    answer_id=bet["answer_id"],
-                    amount=bet["bet_amount"],
-                    outcome=bet["outcome"],
-                )
-                print(f"  Success: {response}")
-                status = "success"
+                reloaded = reloadable and refresh_predictions()
             except Exception as e:
-                print(f"  Error: {e}")
-                response = str(e)
-                status = "error"
-
-            writer.writerow({
-                "timestamp": datetime.now().isoformat(),
-                "market_id": bet["market_id"],
-                "market_key": bet["market_key"],
-                "answer_id": bet["answer_id"],
-                "answer_text": bet["answer_text"],
-                "outcome": bet["outcome"],
-                "amount": bet["bet_amount"],
-                "our_prob": bet["our_prob"],
-                "market_prob": bet["market_prob"],
-                "edge": bet["edge"],
-                "response": status,
-            })
-
-    print(f"\nBet history saved to: {history_path}")
+                print(f"[{datetime.now():%H:%M:%S}] Error reloading predictions.py: {e}")
+                reloaded = False
+            if reloaded:
+                print(f"[{datetime.now():%H:%M:%S}] predictions.py changed, re-evaluating all markets")
+                keys = [k for k in predictions if k in market_ids]
+                last_probs.clear()
+                results = {k: r for k, r in results.items() if k in predictions}
+                for k in keys:
+                    interval[k] = min_interval
+                    next_poll[k] = now
+            due = {k: market_ids[k] for k in keys if next_poll[k] <= now}
+            markets = fetch_markets(client, due, store=store)
+
+            moved = []
+            for key, market in markets.items():
+                if isinstance(market, Exception):
+                    print(f"[{datetime.now():%H:%M:%S}] Error fetching {key}: {market}")
+                    interval[key] = min(max_interval, interval[key] * 1.5)
+                else:
+                    probs = answer_probs(market)
+                    if key not in last_probs or price_moved(last_probs[key], probs, threshold):
+                        try:
+                            results[key] = process_market(
+                                market, key, predictions[key], verbose=False, market_id=market_ids[key],
+                            )
+                            last_probs[key] = probs
+                            moved.append(key)
+                        except Exception as e:
+                            print(f"[{datetime.now():%H:%M:%S}] Error processing {key}: {e}")
+                        interval[key] = max(min_interval, interval[key] / 2)
+                    else:
+                        interval[key] = min(max_interval, interval[key] * 1.5)
+                next_poll[key] = now + interval[key]
+
+            if moved:
+                edges = {k: r["market_edge"] for k, r in results.items()}
+                allocations = allocate_bankroll(edges, bankroll)
+                bets = size_all_bets(results, allocations, sizing=sizing, slippage=slippage)
+                print(f"\n[{datetime.now():%H:%M:%S}] Re-evaluated {len(moved)}/{len(due)} polled markets")
+                for bet in bets:
+                    if bet["market_key"] in moved and bet["bet_amount"] >= 1:
+                        print(f"  {bet['market_name']}: {bet['outcome']} {bet['bet_amount']:.0f} on "
+                              f"{bet['answer_text']} (ours {bet['our_prob']:.1%}, "
+                              f"market {bet['market_prob']:.1%}, edge {bet['edge']:+.1%})")
+                total = sum(b["bet_amount"] for b in bets if b["bet_amount"] >= 1)
+                print(f"  Portfolio: {total:.0f} mana across {len(bets)} bets")
+
+            if max_cycles is not None and cycle >= max_cycles:
+                break
+            time.sleep(max(0.0, min(next_poll.values()) - time.monotonic()))
+    except KeyboardInterrupt:
+        print("\nStopped watching")
 
 
 def main():
@@ -315,17 +778,151 @@ def main():
     parser.add_argument("--confirm", action="store_true", help="Confirm execution (required with --execute)")
     parser.add_argument("--bankroll", type=float, default=TOTAL_BANKROLL, help="Override bankroll amount")
     parser.add_argument("--quiet", action="store_true", help="Less verbose output")
+    parser.add_argument("--max-staleness", type=float, default=CACHE_MAX_STALENESS,
+                        help="Serve cached market data up to this many seconds old (0 = always revalidate)")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk market cache")
+    parser.add_argument("--sizing", choices=["greedy", "joint"], default="greedy",
+                        help="Per-bucket Kelly (greedy) or joint Kelly across each market's buckets")
+    parser.add_argument("--no-slippage", action="store_true",
+                        help="Size greedy bets at the spot price, ignoring CPMM price impact")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep polling and re-evaluate markets whose prices move")
+    parser.add_argument("--watch-threshold", type=float, default=WATCH_PRICE_THRESHOLD,
+                        help="Probability change that triggers re-evaluation in --watch mode")
+    parser.add_argument("--api-base", default=None,
+                        help="API base URL, e.g. a local manifold.fake_server (default: MANIFOLD_API_BASE)")
+    parser.add_argument("--sweep", action="store_true",
+                        help="Fetch once, then evaluate a grid of sizing parameters offline")
+    parser.add_argument("--sweep-bankroll", type=float, nargs="+", default=None,
+                        help="Bankrolls to sweep (default: --bankroll)")
+    parser.add_argument("--sweep-kelly", type=float, nargs="+", default=[0.1, 0.25, 0.5, 1.0])
+    parser.add_argument("--sweep-edge", type=float, nargs="+", default=[0.05, 0.10, 0.15, 0.20])
+    parser.add_argument("--sweep-max-position", type=float, nargs="+", default=[0.05, 0.10, 0.20])
+    parser.add_argument("--workers", type=int, default=None, help="Sweep processes (default: all cores)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print per-stage timings and save them in bet_preview.json")
+    parser.add_argument("--profile-out", type=Path, default=None,
+                        help="Also write a profile: cProfile stats, or pyinstrument HTML for a .html path")
+    parser.add_argument("--allocation", choices=["edge", "copula"], default="edge",
+                        help="Split bankroll by market edge, or maximize log growth over correlated outcomes")
+    parser.add_argument("--copula", choices=["t", "gaussian", "independent"], default=COPULA,
+                        help="How market outcomes are joined in the portfolio model")
+    parser.add_argument("--rebalance", action="store_true",
+                        help="Fetch our current positions and only order the difference to the Kelly targets")
+    parser.add_argument("--no-record", action="store_true",
+                        help="Don't record fetched market payloads in the snapshot store")
+    parser.add_argument("--snapshots", type=Path, default=None,
+                        help="Snapshot store path (default: snapshots.sqlite in the data directory)")
+    parser.add_argument("--replay", nargs="?", const="latest", default=None, metavar="WHEN",
+                        help="Run offline against the recorded snapshot as of an ISO time (default: latest)")
+    parser.add_argument("--backtest", action="store_true",
+                        help="Size bets at every recorded snapshot between --since and --until")
+    parser.add_argument("--since", default=None, help="Backtest start, ISO date/time (default: first snapshot)")
+    parser.add_argument("--until", default=None, help="Backtest end, ISO date/time (default: last snapshot)")
 
     args = parser.parse_args()
 
     if not args.dry_run and not args.execute:
         args.dry_run = True  # Default to dry-run
 
-    output = run_dry_run(verbose=not args.quiet, bankroll=args.bankroll)
-    save_dry_run(output)
+    if args.sweep and (args.execute or args.watch):
+        parser.error("--sweep cannot be combined with --execute or --watch")
+    if (args.replay or args.backtest) and (args.execute or args.watch):
+        parser.error("--replay and --backtest cannot be combined with --execute or --watch")
+    if args.rebalance and (args.replay or args.backtest or args.sweep or args.watch):
+        parser.error("--rebalance works on live dry runs and --execute only")
+
+    from .snapshots import SNAPSHOT_PATH, ReplayClient, SnapshotStore, parse_time
+
+    try:
+        replay_at, since, until = parse_time(args.replay), parse_time(args.since), parse_time(args.until)
+    except ValueError as e:
+        parser.error(f"invalid time: {e}")
+    snapshot_path = args.snapshots or SNAPSHOT_PATH
+    TIMER.enabled = args.profile or args.profile_out is not None
+
+    if args.backtest:
+        from .snapshots import backtest, print_backtest
+
+        store = SnapshotStore(snapshot_path)
+        with profile_to(args.profile_out), TIMER.span("backtest"):
+            rows = backtest(store, since, until, bankroll=args.bankroll,
+                            sizing=args.sizing, slippage=not args.no_slippage)
+        print_backtest(rows)
+        if TIMER.enabled:
+            print("\nStage timings:")
+            print(TIMER.table(wall="backtest"))
+        return
+
+    # Always revalidate before sizing real or rebalancing bets, or while watching
+    max_staleness = args.max_staleness
+    if args.no_cache:
+        max_staleness = None
+    elif args.execute or args.watch or args.rebalance:
+        max_staleness = 0.0
+
+    if args.replay:
+        markets = SnapshotStore(snapshot_path).markets_at(replay_at)
+        if not markets:
+            parser.error(f"no recorded snapshot as of {args.replay} in {snapshot_path}")
+        client = ReplayClient(markets)
+        store = None
+    else:
+        from .api import ManifoldClient, ResponseCache
+
+        cache = ResponseCache(max_staleness=max_staleness) if max_staleness is not None else None
+        client = ManifoldClient(cache=cache, base_url=args.api_base or MANIFOLD_API_BASE)
+        store = None if args.no_record else SnapshotStore(snapshot_path)
+
+    if args.watch:
+        with profile_to(args.profile_out):
+            watch(client, bankroll=args.bankroll, sizing=args.sizing,
+                  slippage=not args.no_slippage, threshold=args.watch_threshold, store=store)
+        return
+
+    if args.sweep:
+        from .predictions import PREDICTIONS
+        from .sweep import print_sweep, run_sweep, sweep_grid
+
+        with profile_to(args.profile_out):
+            market_results = analyze_markets(client, PREDICTIONS, MARKET_IDS,
+                                             verbose=not args.quiet, store=store)
+            configs = sweep_grid(args.sweep_bankroll or [args.bankroll], args.sweep_kelly,
+                                 args.sweep_edge, args.sweep_max_position)
+            print(f"\nSweeping {len(configs)} configs over {len(market_results)} markets "
+                  f"(sizing: {args.sizing})")
+            with TIMER.span("sweep"):
+                results = run_sweep(market_results, configs, sizing=args.sizing,
+                                    slippage=not args.no_slippage, workers=args.workers)
+        print_sweep(results)
+        if TIMER.enabled:
+            print("\nStage timings:")
+            print(TIMER.table(wall="sweep"))
+        return
 
-    if args.execute:
-        execute_bets(output["bets"], confirm=args.confirm)
+    with profile_to(args.profile_out):
+        with TIMER.span("dry_run"):
+            output = run_dry_run(verbose=not args.quiet, bankroll=args.bankroll, client=client,
+                                 sizing=args.sizing, slippage=not args.no_slippage, store=store,
+                                 allocation=args.allocation, copula=args.copula)
+        if args.rebalance:
+            with TIMER.span("rebalance"):
+                output = rebalance(output, client)
+        if args.replay:
+            print("\nReplayed a recorded snapshot; bet_preview.json left unchanged")
+        else:
+            save_dry_run(output)
+
+        if args.execute:
+            with TIMER.span("execute"):
+                execute_bets(output["bets"], confirm=args.confirm, client=client)
+
+    if not args.quiet and not args.replay:
+        print("\nRequest latency:")
+        print(client.latency.format())
+    if TIMER.enabled:
+        print("\nStage timings:")
+        print(TIMER.table(wall="dry_run"))
 
 
 if __name__ == "__main__":
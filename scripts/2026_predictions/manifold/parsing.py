@@ -0,0 +1,155 @@
+"""Bucket boundary parsing for market answer text.
+
+Patterns are compiled once at import. The unit family to try first is chosen
+once per market from its prediction's unit, and results are memoized by
+(answer_text, market_key), so repeated polls never re-parse the same answer.
+"""
+
+import re
+from functools import lru_cache
+from typing import Callable, Iterable
+
+from .predictions import PREDICTIONS
+
+
+Bounds = tuple[float | None, float | None]
+Parser = Callable[[str], Bounds | None]
+
+_PP_RANGE = re.compile(r'([+-]?\d+(?:\.\d+)?)\s*(?:to|-)\s*([+-]?\d+(?:\.\d+)?)\s*pp', re.IGNORECASE)
+_PP_BOUNDARY = re.compile(r'([<>≤≥])\s*([+-]?\d+(?:\.\d+)?)\s*pp', re.IGNORECASE)
+_MULTIPLIER = re.compile(r'([<>≤≥]?)\s*(\d+(?:\.\d+)?)\s*x?\s*(?:to|-)?\s*(\d+(?:\.\d+)?)?\s*x?', re.IGNORECASE)
+_DOLLARS = re.compile(r'\$?(\d+(?:\.\d+)?)\s*B?\s*(?:to|-)?\s*\$?(\d+(?:\.\d+)?)?')
+_PERCENT = re.compile(r'([<>≤≥]?)\s*(\d+(?:\.\d+)?)\s*%?\s*(?:to|-)?\s*(\d+(?:\.\d+)?)?\s*%?')
+_MONTHS = re.compile(r'([<>≤≥]?)\s*(\d+(?:\.\d+)?)\s*(?:to|-)?\s*(\d+(?:\.\d+)?)?\s*month', re.IGNORECASE)
+_PLAIN = re.compile(r'([<>≤≥]?)\s*(\d+(?:\.\d+)?)\s*(?:to|-)?\s*(\d+(?:\.\d+)?)?')
+
+
+def _prefixed_bounds(match: re.Match) -> Bounds | None:
+    """Bounds from a (prefix, val1, val2) match: a range or a one-sided bucket."""
+    prefix, val1, val2 = match.groups()
+    val1 = float(val1)
+    if val2:
+        return (val1, float(val2))
+    if prefix in ('<', '≤'):
+        return (None, val1)
+    if prefix in ('>', '≥'):
+        return (val1, None)
+    return None
+
+
+def _parse_pp(text: str) -> Bounds | None:
+    """Percentage-point changes (YouGov sentiment): "-30 to -20pp", "≥+10pp", "<-30pp"."""
+    lower = text.lower()
+    if "pp" not in lower and "percentage point" not in lower:
+        return None
+    range_match = _PP_RANGE.search(text)
+    if range_match:
+        return (float(range_match.group(1)), float(range_match.group(2)))
+    boundary_match = _PP_BOUNDARY.search(text)
+    if boundary_match:
+        prefix, val = boundary_match.groups()
+        if prefix in ('<', '≤'):
+            return (None, float(val))
+        return (float(val), None)
+    return None
+
+
+def _parse_multiplier(text: str) -> Bounds | None:
+    """Multipliers (METR uplift): "1.5-2x", "<1x"."""
+    if 'x' not in text.lower():
+        return None
+    match = _MULTIPLIER.search(text)
+    return _prefixed_bounds(match) if match else None
+
+
+def _parse_dollars(text: str) -> Bounds | None:
+    """Dollar amounts: "$35B-$60B", "≥$90B"."""
+    if '$' not in text:
+        return None
+    match = _DOLLARS.search(text)
+    if not match:
+        return None
+    val1 = float(match.group(1))
+    val2 = float(match.group(2)) if match.group(2) else None
+    if val2:
+        return (val1, val2)
+    if '≥' in text or '>' in text:
+        return (val1, None)
+    if '<' in text or '≤' in text:
+        return (None, val1)
+    return None
+
+
+def _parse_percent(text: str) -> Bounds | None:
+    """Percentages: "35%-50%", "<10%"."""
+    if '%' not in text:
+        return None
+    match = _PERCENT.search(text)
+    return _prefixed_bounds(match) if match else None
+
+
+def _parse_months(text: str) -> Bounds | None:
+    """Durations: "1-2 months", "≥7 months"."""
+    if 'month' not in text.lower():
+        return None
+    match = _MONTHS.search(text)
+    return _prefixed_bounds(match) if match else None
+
+
+def _parse_plain(text: str) -> Bounds | None:
+    """Plain numbers (e.g., Epoch capabilities index): "165-170", "≥185"."""
+    match = _PLAIN.search(text)
+    return _prefixed_bounds(match) if match else None
+
+
+# Order used when the unit family is unknown (or its parser doesn't match)
+_GENERIC_CHAIN: tuple[Parser, ...] = (
+    _parse_pp, _parse_multiplier, _parse_dollars, _parse_percent, _parse_months, _parse_plain,
+)
+
+_UNIT_PARSERS: dict[str, Parser] = {
+    "pp": _parse_pp,
+    "multiplier": _parse_multiplier,
+    "billion_usd": _parse_dollars,
+    "percent": _parse_percent,
+    "months": _parse_months,
+    # "index" markets use the generic chain: plain numbers match almost any
+    # text, so trying them first would shadow the unit-specific formats
+}
+
+
+@lru_cache(maxsize=None)
+def parser_chain(market_key: str) -> tuple[Parser, ...]:
+    """Parsers to try for a market, its own unit family first."""
+    prediction = PREDICTIONS.get(market_key)
+    first = _UNIT_PARSERS.get(prediction.unit) if prediction else None
+    if first is None:
+        return _GENERIC_CHAIN
+    return (first,) + tuple(p for p in _GENERIC_CHAIN if p is not first)
+
+
+@lru_cache(maxsize=8192)
+def parse_bucket_boundaries(answer_text: str, market_key: str) -> Bounds:
+    """Parse bucket boundaries from answer text.
+
+    Handles various formats:
+    - "1-2 months" -> (1, 2)
+    - "≥7 months" -> (7, inf)
+    - "<3 months" -> (-inf, 3)
+    - "35%-50%" -> (35, 50)
+    - "$35B-$60B" -> (35, 60)
+    - etc.
+
+    Returns (lower, upper) bounds. None means unbounded.
+    """
+    text = answer_text.strip()
+    for parser in parser_chain(market_key):
+        bounds = parser(text)
+        if bounds is not None:
+            return bounds
+    return (None, None)
+
+
+def parse_many(answers: Iterable[str], market_key: str) -> list[Bounds]:
+    """Parse every answer text of one market."""
+    return [parse_bucket_boundaries(text, market_key) for text in answers]
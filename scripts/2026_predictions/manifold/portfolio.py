@@ -0,0 +1,298 @@
+"""Correlated portfolio risk across markets, via copula sampling.
+
+Several markets move together (METR horizon, FrontierMath, GSO, ECI and lab
+revenues all track AI progress), so bets on them win and lose together.
+Joint outcomes are drawn through a Gaussian or Student-t copula whose
+correlation follows the one-factor model in config.CAPABILITY_LOADINGS.
+Each market then resolves to the bucket whose CDF interval holds its draw
+(buckets in value order), so every marginal is exactly our distribution.
+
+Growth, variance and tail risk of any set of bets are read off the same
+draws through its payoff table. Bet sizes are linear in a market's
+allocation, so allocate maximizes the sample mean of log wealth over
+allocations using P&L per unit of allocation (at spot prices, ignoring the
+minimum bet size); the final bets are then sized as usual.
+
+Usage:
+    python -m manifold.main --allocation copula
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Sequence
+
+import numpy as np
+from scipy.special import ndtri, stdtrit
+
+from .config import (
+    CAPABILITY_LOADINGS, COPULA, COPULA_DOF, PORTFOLIO_SAMPLES,
+    KELLY_FRACTION, EDGE_THRESHOLD, MAX_POSITION_PCT,
+)
+from .kelly import size_bets_batch
+
+
+def correlation_matrix(keys: Sequence[str], loadings: dict[str, float] = CAPABILITY_LOADINGS) -> np.ndarray:
+    """Outcome correlation between markets under the one-factor model."""
+    loading = np.array([loadings.get(k, 0.0) for k in keys])
+    corr = np.outer(loading, loading)
+    np.fill_diagonal(corr, 1.0)
+    return corr
+
+
+def sample_latent(
+    rng: np.random.Generator,
+    n_samples: int,
+    corr: np.ndarray,
+    copula: str = COPULA,
+    dof: float = COPULA_DOF,
+) -> np.ndarray:
+    """Latent draws of shape (markets, n_samples) joined by a copula.
+
+    copula is "t" (joint extremes more likely), "gaussian" or "independent"
+    (latent draws are then uniforms). Outcomes are resolved by comparing
+    these to latent_ppf of the CDF levels, which avoids mapping every draw
+    back to a uniform.
+    """
+    k = len(corr)
+    if copula == "independent":
+        return rng.random((k, n_samples))
+    z = np.linalg.cholesky(corr) @ rng.standard_normal((k, n_samples))
+    if copula == "gaussian":
+        return z
+    if copula != "t":
+        raise ValueError(f"Unknown copula: {copula}")
+    z /= np.sqrt(rng.chisquare(dof, n_samples) / dof)
+    return z
+
+
+@lru_cache(maxsize=2)
+def joint_latent(
+    keys: tuple[str, ...],
+    n_samples: int = PORTFOLIO_SAMPLES,
+    copula: str = COPULA,
+    dof: float = COPULA_DOF,
+    seed: int = 0,
+) -> np.ndarray:
+    """sample_latent for these markets' correlation, kept for reuse.
+
+    The draws depend only on the market set and copula, so a resident
+    process (manifold.daemon) samples them once rather than per evaluation.
+    The array is read-only.
+    """
+    latent = sample_latent(np.random.default_rng(seed), n_samples, correlation_matrix(keys), copula, dof)
+    latent.setflags(write=False)
+    return latent
+
+
+def latent_ppf(q: np.ndarray, copula: str = COPULA, dof: float = COPULA_DOF) -> np.ndarray:
+    """Latent value at CDF level q (inverse of the copula's marginal)."""
+    if copula == "independent":
+        return np.asarray(q, dtype=float)
+    if copula == "gaussian":
+        return ndtri(q)
+    return stdtrit(dof, q)
+
+
+def threshold_index(thresholds: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Number of (sorted) thresholds at or below each value.
+
+    Same as searchsorted(thresholds, values, side="right"), but for a
+    handful of thresholds one comparison pass each is faster than a binary
+    search per value.
+    """
+    index = np.zeros(values.shape, dtype=np.intp)
+    for threshold in thresholds:
+        index += values >= threshold
+    return index
+
+
+def value_order(bounds: Sequence[tuple[float | None, float | None]]) -> np.ndarray:
+    """Bucket indices sorted by the values they cover."""
+    lowers = np.array([-np.inf if lo is None else lo for lo, _ in bounds])
+    uppers = np.array([np.inf if hi is None else hi for _, hi in bounds])
+    return np.lexsort((uppers, lowers))
+
+
+def resolve_buckets(
+    our_probs: Sequence[np.ndarray],
+    orders: Sequence[np.ndarray],
+    latent: np.ndarray,
+    copula: str = COPULA,
+    dof: float = COPULA_DOF,
+) -> np.ndarray:
+    """Resolving bucket index of every market for each latent draw, (markets, samples)."""
+    out = np.empty(latent.shape, dtype=np.intp)
+    for m, (probs, order) in enumerate(zip(our_probs, orders)):
+        # The last threshold is the top of the CDF and never binds
+        thresholds = latent_ppf(np.cumsum(np.asarray(probs)[order])[:-1], copula, dof)
+        out[m] = order[threshold_index(thresholds, latent[m])]
+    return out
+
+
+@lru_cache(maxsize=32)
+def _resolved_row(
+    latent_args: tuple,
+    m: int,
+    probs: tuple[float, ...],
+    order: tuple[int, ...],
+) -> np.ndarray:
+    """Row m of resolve_buckets over joint_latent(*latent_args), kept for reuse.
+
+    A row only changes with its market's probabilities, so re-evaluating
+    after one prediction edit resolves just that market again.
+    """
+    _, _, copula, dof, _ = latent_args
+    latent = joint_latent(*latent_args)[m:m + 1]
+    row = resolve_buckets([np.array(probs)], [np.array(order)], latent, copula, dof)[0]
+    row.setflags(write=False)
+    return row
+
+
+def payoff_table(
+    lengths: np.ndarray,
+    market: np.ndarray,
+    bucket: np.ndarray,
+    amount: np.ndarray,
+    price: np.ndarray,
+    is_yes: np.ndarray,
+) -> np.ndarray:
+    """Net P&L of a set of bets if each bucket resolves, shape (markets, max_buckets).
+
+    price is the (average) price paid per share of the side bought.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        payout = np.where(price > 0, amount / price, 0.0)
+    hit = np.where(is_yes, payout, 0.0) - amount
+    miss = np.where(is_yes, 0.0, payout) - amount
+
+    # Every bet's miss payoff on all of its market's buckets, then correct
+    # its own bucket to the hit payoff
+    miss_total = np.zeros(len(lengths))
+    np.add.at(miss_total, market, miss)
+    table = np.where(np.arange(lengths.max(initial=0)) < lengths[:, None], miss_total[:, None], 0.0)
+    np.add.at(table, (market, bucket), hit - miss)
+    return table
+
+
+def unit_payoffs(
+    our_probs: Sequence[np.ndarray],
+    market_probs: Sequence[np.ndarray],
+    kelly_mult: float = KELLY_FRACTION,
+    edge_threshold: float = EDGE_THRESHOLD,
+    max_position_pct: float = MAX_POSITION_PCT,
+) -> np.ndarray:
+    """P&L per unit of allocation if each bucket resolves, at spot prices."""
+    bets = size_bets_batch(
+        our_probs, market_probs, np.ones(len(our_probs)), kelly_mult=kelly_mult,
+        edge_threshold=edge_threshold, max_position_pct=max_position_pct, min_bet=0.0,
+    )
+    is_yes = bets["outcome"] == "YES"
+    return payoff_table(
+        np.array([len(p) for p in our_probs]), bets["market"], bets["bucket"], bets["bet_amount"],
+        np.where(is_yes, bets["market_prob"], 1 - bets["market_prob"]), is_yes,
+    )
+
+
+def bet_payoffs(market_results: dict[str, dict], bets: list[dict]) -> np.ndarray:
+    """Payoff table of sized bets (size_all_bets dicts), at their CPMM fill prices."""
+    from .cpmm import fill_price
+
+    index = {k: m for m, k in enumerate(market_results)}
+    results = list(market_results.values())
+    answer_pos = [{b[0]: i for i, b in enumerate(r["bucket_data"])} for r in results]
+    bets = [b for b in bets if b["bet_amount"] >= 1]
+    market = np.array([index[b["market_key"]] for b in bets], dtype=np.int64)
+    bucket = np.array([answer_pos[m][b["answer_id"]] for m, b in zip(market, bets)], dtype=np.int64)
+    amount = np.array([b["bet_amount"] for b in bets], dtype=float)
+    is_yes = np.array([b["outcome"] == "YES" for b in bets], dtype=bool)
+    pool_yes = np.array([results[m]["pool_yes"][i] for m, i in zip(market, bucket)], dtype=float)
+    pool_no = np.array([results[m]["pool_no"][i] for m, i in zip(market, bucket)], dtype=float)
+    prob = np.array([b["market_prob"] for b in bets], dtype=float)
+    price = fill_price(pool_yes, pool_no, amount, is_yes, prob=prob)
+    return payoff_table(np.array([len(r["our_probs"]) for r in results]), market, bucket, amount,
+                        np.nan_to_num(price), is_yes)
+
+
+@dataclass
+class PortfolioModel:
+    """Sampled joint outcomes for a set of processed markets."""
+
+    keys: list[str]
+    buckets: np.ndarray  # (markets, samples) resolving bucket index
+    unit_table: np.ndarray  # (markets, max_buckets) P&L per unit of allocation
+    kelly_mult: float
+    copula: str
+
+    def returns(self, table: np.ndarray) -> np.ndarray:
+        """Per-sample P&L of every market under a payoff table, (markets, samples)."""
+        return np.take_along_axis(table, self.buckets, axis=1)
+
+    def stats(self, table: np.ndarray, bankroll: float) -> dict:
+        """Expected log growth and P&L distribution of a payoff table in mana."""
+        profit = self.returns(table).sum(axis=0)
+        wealth = 1.0 + profit / bankroll
+        return {
+            "expected_log_growth": float(np.log(np.maximum(wealth, 1e-12)).mean()),
+            "expected_profit": float(profit.mean()),
+            "std_profit": float(profit.std()),
+            "p5_profit": float(np.quantile(profit, 0.05)),
+            "prob_loss": float((profit < 0).mean()),
+        }
+
+    def allocate(self, bankroll: float, start: dict[str, float] | None = None) -> dict[str, float]:
+        """Allocations (summing to at most bankroll) maximizing correlated log growth.
+
+        Stakes scale with kelly_mult, so growth is maximized for the
+        full-Kelly equivalent (returns / kelly_mult): the fractional bets then
+        stay that fraction of the jointly optimal portfolio instead of being
+        levered back up by concentrating allocation.
+        """
+        from scipy.optimize import minimize
+
+        r = self.returns(self.unit_table) / self.kelly_mult
+        active = np.abs(self.unit_table).max(axis=1) > 0
+        if not active.any():
+            return {k: 0.0 for k in self.keys}
+        x0 = np.array([(start or {}).get(k, 0.0) for k in self.keys]) / bankroll
+        x0 = np.where(active, x0, 0.0)
+
+        def objective(x):
+            wealth = np.maximum(1.0 + x @ r, 1e-12)
+            return -np.log(wealth).mean(), -(r / wealth).mean(axis=1)
+
+        res = minimize(
+            objective, x0, jac=True, method="SLSQP",
+            bounds=[(0.0, 1.0 if a else 0.0) for a in active],
+            constraints=[{"type": "ineq", "fun": lambda x: 1.0 - x.sum(), "jac": lambda x: -np.ones_like(x)}],
+        )
+        x = np.clip(res.x, 0.0, 1.0)
+        return {k: float(v * bankroll) for k, v in zip(self.keys, x)}
+
+
+def build_model(
+    market_results: dict[str, dict],
+    n_samples: int = PORTFOLIO_SAMPLES,
+    copula: str = COPULA,
+    dof: float = COPULA_DOF,
+    seed: int = 0,
+    kelly_mult: float = KELLY_FRACTION,
+    edge_threshold: float = EDGE_THRESHOLD,
+    max_position_pct: float = MAX_POSITION_PCT,
+) -> PortfolioModel:
+    """Draw joint outcomes for process_market results."""
+    keys = list(market_results)
+    results = list(market_results.values())
+    our_probs = [r["our_probs"] for r in results]
+    latent_args = (tuple(keys), n_samples, copula, dof, seed)
+    orders = [value_order([b[3] for b in r["bucket_data"]]) for r in results]
+    return PortfolioModel(
+        keys=keys,
+        buckets=np.stack([
+            _resolved_row(latent_args, m, tuple(np.asarray(probs, dtype=float).tolist()), tuple(order.tolist()))
+            for m, (probs, order) in enumerate(zip(our_probs, orders))
+        ]) if keys else np.empty((0, n_samples), dtype=np.intp),
+        unit_table=unit_payoffs(our_probs, [r["market_probs"] for r in results],
+                                kelly_mult, edge_threshold, max_position_pct),
+        kelly_mult=kelly_mult,
+        copula=copula,
+    )
@@ -1,9 +1,10 @@
 """Our 2026 AI predictions with distribution parameters."""
 
 from dataclasses import dataclass
+from pathlib import Path
 from typing import Literal
 
-DistType = Literal["normal", "lognormal", "truncated_normal"]
+DistType = Literal["normal", "lognormal", "truncated_normal", "metalog"]
 
 
 @dataclass
@@ -17,9 +18,12 @@ class Prediction:
     p90: float
     dist_type: DistType
     unit: str
-    # Bounds for truncated normal
+    # Bounds for truncated normal (and bounded metalog)
     lower_bound: float | None = None
     upper_bound: float | None = None
+    # Full percentile forecast for metalog, e.g. {0.05: 6, 0.25: 17, ...};
+    # when unset, a metalog is fitted to p10/median/p90
+    quantiles: dict[float, float] | None = None
 
 
 # All 10 predictions from the 2026 AI forecast survey
@@ -124,3 +128,25 @@ def get_prediction(key: str) -> Prediction:
     if key not in PREDICTIONS:
         raise KeyError(f"Unknown prediction key: {key}")
     return PREDICTIONS[key]
+
+
+_loaded_mtime = Path(__file__).stat().st_mtime
+
+
+def reload_if_changed() -> bool:
+    """Re-read this file if it changed on disk since it was loaded.
+
+    PREDICTIONS is updated in place, so modules that imported it see the new
+    values. Returns True if the predictions were reloaded; if the edited file
+    fails to load, the exception propagates and the old values are kept.
+    """
+    global _loaded_mtime
+    mtime = Path(__file__).stat().st_mtime
+    if mtime == _loaded_mtime:
+        return False
+    namespace = {"__name__": __name__, "__file__": __file__}
+    exec(compile(Path(__file__).read_text(), __file__, "exec"), namespace)
+    PREDICTIONS.clear()
+    PREDICTIONS.update(namespace["PREDICTIONS"])
+    _loaded_mtime = mtime
+    return True
@@ -0,0 +1,106 @@
+"""Per-stage timing for the betting pipeline.
+
+Stages are wrapped in `with TIMER.span("fit"):`. While the timer is disabled
+(the default) span returns a shared no-op context manager, so instrumented
+code pays one attribute check per span. main --profile enables it, prints
+the stage table and writes the timings into bet_preview.json.
+"""
+
+import contextlib
+import threading
+import time
+from pathlib import Path
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class StageTimer:
+    """Accumulates wall-clock time and call counts per named stage."""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.totals: dict[str, float] = {}
+        self.counts: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def span(self, name: str):
+        """Context manager timing one pass through a stage."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name)
+
+    @contextlib.contextmanager
+    def _span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.totals[name] = self.totals.get(name, 0.0) + elapsed
+                self.counts[name] = self.counts.get(name, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self.totals.clear()
+            self.counts.clear()
+
+    def as_dict(self) -> dict[str, dict[str, float]]:
+        """Stage -> {"calls", "total_ms"}, in first-seen order."""
+        return {
+            name: {"calls": self.counts[name], "total_ms": round(total * 1000, 3)}
+            for name, total in self.totals.items()
+        }
+
+    def table(self, wall: str) -> str:
+        """Printable stage table, with each stage's share of the `wall` stage."""
+        wall_s = self.totals.get(wall)
+        lines = [f"  {'Stage':<16} {'Calls':>6} {'Total ms':>10} {'Share':>7}"]
+        for name, total in self.totals.items():
+            share = f"{total / wall_s:7.1%}" if wall_s and name != wall else ""
+            lines.append(f"  {name:<16} {self.counts[name]:>6} {total * 1000:>10.2f} {share:>7}")
+        return "\n".join(lines)
+
+
+# Shared by the pipeline; main --profile enables it
+TIMER = StageTimer()
+
+
+@contextlib.contextmanager
+def profile_to(path: Path | None):
+    """Profile the enclosed block into `path` (no-op when path is None).
+
+    A .html path uses pyinstrument if it is installed; anything else gets
+    cProfile stats, readable with pstats or snakeviz.
+    """
+    if path is None:
+        yield
+        return
+    path = Path(path)
+    if path.suffix == ".html":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            path = path.with_suffix(".prof")
+            print(f"pyinstrument is not installed; writing cProfile stats to {path}")
+        else:
+            profiler = Profiler()
+            profiler.start()
+            try:
+                yield
+            finally:
+                profiler.stop()
+                path.write_text(profiler.output_html())
+                print(f"Profile written to: {path}")
+            return
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"Profile written to: {path}")
@@ -0,0 +1,283 @@
+"""Monte Carlo bankroll simulation for choosing Kelly parameters.
+
+Takes a market snapshot (by default the last saved dry run), sizes bets for
+every (kelly_fraction, edge_threshold, max_position_pct) in a grid, then draws
+joint outcomes from our fitted distributions and resolves every bet at once.
+Outcomes are correlated through the copula in manifold.portfolio (t by
+default; --copula independent reproduces independent markets). Markets
+resolve one after another in snapshot order, which gives a bankroll path for
+drawdowns.
+
+Samples are split into chunks and simulated on a process pool; each chunk
+returns fixed-size accumulators (sums and histograms), so memory stays flat
+however many samples are drawn.
+
+Usage:
+    python -m manifold.simulate --samples 2000000
+    python -m manifold.simulate --kelly 0.1 0.25 0.5 --edge 0.05 0.1 --max-position 0.1
+"""
+
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from .config import DATA_DIR, KELLY_FRACTION, EDGE_THRESHOLD, MAX_POSITION_PCT, MIN_BET_SIZE, COPULA
+from .distributions import fit_prediction, compute_bucket_probs
+from .kelly import calculate_market_edge, allocate_bankroll, size_bets_batch
+from .parsing import parse_many
+from .portfolio import correlation_matrix, resolve_buckets, sample_latent, value_order
+from .predictions import PREDICTIONS
+
+
+CHUNK_SIZE = 50_000  # samples per worker task; memory ~ configs x chunk floats
+LOG_WEALTH_BINS = np.linspace(-5.0, 5.0, 4001)  # log(terminal / bankroll)
+DRAWDOWN_BINS = np.linspace(0.0, 1.0, 1001)
+
+
+@dataclass
+class SnapshotMarket:
+    """One market as seen at snapshot time."""
+
+    key: str
+    our_probs: np.ndarray
+    market_probs: np.ndarray
+    value_order: np.ndarray  # bucket indices sorted by bucket value
+
+
+@dataclass
+class SimConfig:
+    """One point of the parameter grid."""
+
+    kelly_fraction: float
+    edge_threshold: float
+    max_position_pct: float
+
+
+def load_snapshot(path: Path = DATA_DIR / "bet_preview.json") -> list[SnapshotMarket]:
+    """Load market prices from a saved dry run and recompute our bucket probs."""
+    with open(path) as f:
+        preview = json.load(f)
+    return snapshot_from_markets({
+        key: [(b["text"], b["market_prob"]) for b in market["buckets"]]
+        for key, market in preview["markets"].items()
+    })
+
+
+def snapshot_from_markets(markets: dict[str, list[tuple[str, float]]]) -> list[SnapshotMarket]:
+    """Build snapshot markets from market_key -> [(answer_text, market_prob)]."""
+    snapshot = []
+    for key, buckets in markets.items():
+        if key not in PREDICTIONS or not buckets:
+            continue
+        dist = fit_prediction(PREDICTIONS[key])
+        bounds = parse_many([text for text, _ in buckets], key)
+        snapshot.append(SnapshotMarket(
+            key=key,
+            our_probs=compute_bucket_probs(dist, bounds),
+            market_probs=np.array([p for _, p in buckets], dtype=float),
+            value_order=value_order(bounds),
+        ))
+    return snapshot
+
+
+def payoff_tables(
+    snapshot: list[SnapshotMarket],
+    configs: list[SimConfig],
+    bankroll: float,
+    min_bet: float = MIN_BET_SIZE,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Net P&L for every (config, market, resolving bucket).
+
+    Returns (tables, stakes): tables has shape (configs, markets, max_buckets)
+    indexed by bucket, stakes the total mana bet per config.
+    """
+    edges = {m.key: calculate_market_edge(m.our_probs, m.market_probs) for m in snapshot}
+    allocations = allocate_bankroll(edges, bankroll)
+    max_buckets = max(len(m.our_probs) for m in snapshot)
+    tables = np.zeros((len(configs), len(snapshot), max_buckets))
+    stakes = np.zeros(len(configs))
+
+    for c, cfg in enumerate(configs):
+        bets = size_bets_batch(
+            [m.our_probs for m in snapshot],
+            [m.market_probs for m in snapshot],
+            [allocations[m.key] for m in snapshot],
+            kelly_mult=cfg.kelly_fraction,
+            edge_threshold=cfg.edge_threshold,
+            max_position_pct=cfg.max_position_pct,
+            min_bet=min_bet,
+        )
+        stakes[c] = bets["bet_amount"].sum()
+        for bet in bets:
+            market = snapshot[bet["market"]]
+            n = len(market.our_probs)
+            hit = np.zeros(max_buckets, dtype=bool)
+            hit[bet["bucket"]] = True
+            if bet["outcome"] == "YES":
+                payout = np.where(hit, bet["bet_amount"] / bet["market_prob"], 0.0)
+            else:
+                payout = np.where(hit, 0.0, bet["bet_amount"] / (1 - bet["market_prob"]))
+            payout[n:] = 0.0
+            tables[c, bet["market"]] += payout - bet["bet_amount"]
+    return tables, stakes
+
+
+def _histogram_rows(values: np.ndarray, bins: np.ndarray) -> np.ndarray:
+    """Per-row histograms of a (rows, n) array over uniform bins."""
+    n_bins = len(bins) - 1
+    idx = ((values - bins[0]) / (bins[1] - bins[0])).astype(np.int64)
+    idx = np.clip(idx, 0, n_bins - 1) + np.arange(len(values))[:, None] * n_bins
+    return np.bincount(idx.ravel(), minlength=len(values) * n_bins).reshape(len(values), n_bins)
+
+
+def _simulate_chunk(args) -> dict[str, np.ndarray]:
+    """Simulate one chunk of samples for every config (runs in a worker)."""
+    snapshot, tables, bankroll, ruin_level, n_samples, seed, corr, copula = args
+    rng = np.random.default_rng(seed)
+    buckets = resolve_buckets(
+        [m.our_probs for m in snapshot],
+        [m.value_order for m in snapshot],
+        sample_latent(rng, n_samples, corr, copula),
+        copula,
+    )
+
+    # Walk markets in resolution order, all configs x samples at once
+    wealth = np.full((tables.shape[0], n_samples), float(bankroll))
+    peak = wealth.copy()
+    drawdown = np.zeros_like(wealth)
+    for m in range(len(snapshot)):
+        wealth += tables[:, m, buckets[m]]
+        np.maximum(peak, wealth, out=peak)
+        np.maximum(drawdown, (peak - wealth) / peak, out=drawdown)
+    log_wealth = np.log(np.maximum(wealth, 1e-9) / bankroll)
+
+    return {
+        "n": np.array(n_samples),
+        "sum_terminal": wealth.sum(axis=1),
+        "sum_log": log_wealth.sum(axis=1),
+        "ruin": (wealth <= ruin_level * bankroll).sum(axis=1),
+        "log_hist": _histogram_rows(log_wealth, LOG_WEALTH_BINS),
+        "dd_hist": _histogram_rows(drawdown, DRAWDOWN_BINS),
+    }
+
+
+def _hist_quantile(hist: np.ndarray, bins: np.ndarray, q: float) -> float:
+    """Approximate quantile from a histogram (bin upper edge)."""
+    cum = np.cumsum(hist)
+    return float(bins[1:][np.searchsorted(cum, q * cum[-1])])
+
+
+def simulate(
+    snapshot: list[SnapshotMarket],
+    configs: list[SimConfig],
+    bankroll: float,
+    n_samples: int = 1_000_000,
+    ruin_level: float = 0.5,
+    seed: int = 0,
+    workers: int | None = None,
+    chunk_size: int = CHUNK_SIZE,
+    copula: str = COPULA,
+) -> list[dict]:
+    """Simulate terminal bankroll, drawdown and ruin for each config.
+
+    ruin_level is the fraction of the starting bankroll at or below which a
+    run counts as ruined. copula joins the markets' outcomes (see
+    portfolio.sample_latent).
+
+    Returns one summary dict per config.
+    """
+    tables, stakes = payoff_tables(snapshot, configs, bankroll)
+    # Many grid points size identical bets; simulate each distinct table once
+    tables, config_to_table = np.unique(tables, axis=0, return_inverse=True)
+    config_to_table = config_to_table.ravel()
+
+    sizes = [chunk_size] * (n_samples // chunk_size)
+    if n_samples % chunk_size:
+        sizes.append(n_samples % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    corr = correlation_matrix([m.key for m in snapshot])
+    jobs = [(snapshot, tables, bankroll, ruin_level, size, s, corr, copula) for size, s in zip(sizes, seeds)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) == 1:
+        chunks = [_simulate_chunk(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            chunks = list(pool.map(_simulate_chunk, jobs))
+
+    total = {k: sum(chunk[k] for chunk in chunks) for k in chunks[0]}
+    n = float(total["n"])
+    results = []
+    for c, cfg in enumerate(configs):
+        t = config_to_table[c]
+        log_hist = total["log_hist"][t]
+        dd_hist = total["dd_hist"][t]
+        results.append({
+            **vars(cfg),
+            "total_stake": float(stakes[c]),
+            "mean_terminal": total["sum_terminal"][t] / n,
+            "p5_terminal": bankroll * np.exp(_hist_quantile(log_hist, LOG_WEALTH_BINS, 0.05)),
+            "median_terminal": bankroll * np.exp(_hist_quantile(log_hist, LOG_WEALTH_BINS, 0.5)),
+            "p95_terminal": bankroll * np.exp(_hist_quantile(log_hist, LOG_WEALTH_BINS, 0.95)),
+            "expected_log_growth": total["sum_log"][t] / n,
+            "mean_drawdown": float((dd_hist * (DRAWDOWN_BINS[:-1] + DRAWDOWN_BINS[1:]) / 2).sum() / n),
+            "p95_drawdown": _hist_quantile(dd_hist, DRAWDOWN_BINS, 0.95),
+            "ruin_prob": total["ruin"][t] / n,
+        })
+    return results
+
+
+def print_results(results: list[dict]):
+    """Print the sweep as a table, best expected log growth first."""
+    print(f"  {'Kelly':>5} {'Edge':>5} {'MaxPos':>6} {'Stake':>7} {'Mean':>8} {'p5':>8} "
+          f"{'Median':>8} {'p95':>8} {'E[logG]':>8} {'DD':>6} {'DD95':>6} {'Ruin':>7}")
+    for r in sorted(results, key=lambda r: -r["expected_log_growth"]):
+        print(f"  {r['kelly_fraction']:>5.2f} {r['edge_threshold']:>5.2f} {r['max_position_pct']:>6.2f} "
+              f"{r['total_stake']:>7.0f} {r['mean_terminal']:>8.0f} {r['p5_terminal']:>8.0f} "
+              f"{r['median_terminal']:>8.0f} {r['p95_terminal']:>8.0f} "
+              f"{r['expected_log_growth']:>+8.4f} {r['mean_drawdown']:>6.1%} {r['p95_drawdown']:>6.1%} "
+              f"{r['ruin_prob']:>7.2%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo sweep over Kelly parameters")
+    parser.add_argument("--snapshot", type=Path, default=DATA_DIR / "bet_preview.json",
+                        help="Saved dry run to take market prices from")
+    parser.add_argument("--bankroll", type=float, default=None, help="Defaults to the snapshot's bankroll")
+    parser.add_argument("--samples", type=int, default=1_000_000)
+    parser.add_argument("--kelly", type=float, nargs="+", default=[0.1, 0.25, 0.5, 1.0])
+    parser.add_argument("--edge", type=float, nargs="+", default=[0.05, 0.10, 0.15, 0.20])
+    parser.add_argument("--max-position", type=float, nargs="+", default=[0.05, 0.10, 0.20])
+    parser.add_argument("--ruin-level", type=float, default=0.5,
+                        help="Terminal bankroll fraction counted as ruin")
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--copula", choices=["t", "gaussian", "independent"], default=COPULA,
+                        help="How market outcomes are joined")
+    args = parser.parse_args()
+
+    with open(args.snapshot) as f:
+        bankroll = args.bankroll or json.load(f)["config"]["bankroll"]
+    snapshot = load_snapshot(args.snapshot)
+    configs = [SimConfig(k, e, p) for k, e, p in itertools.product(args.kelly, args.edge, args.max_position)]
+
+    print(f"Simulating {args.samples:,} joint outcomes x {len(configs)} configs "
+          f"over {len(snapshot)} markets (bankroll {bankroll:.0f}, {args.copula} copula)")
+    print(f"Current config: kelly={KELLY_FRACTION}, edge={EDGE_THRESHOLD}, max_position={MAX_POSITION_PCT}")
+    start = time.perf_counter()
+    results = simulate(snapshot, configs, bankroll, n_samples=args.samples,
+                       ruin_level=args.ruin_level, seed=args.seed, workers=args.workers,
+                       copula=args.copula)
+    print(f"Done in {time.perf_counter() - start:.1f}s\n")
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""Append-only store of fetched market payloads, for replay and backtests.
+
+Every market payload a dry run, sweep or watch fetches is recorded with its
+fetch time. Rows are only ever inserted, and a payload identical to the last
+one recorded for its market is skipped, so polling a quiet market costs
+nothing. Payloads are stored as zlib-compressed JSON.
+
+A snapshot at time t is the latest payload of each market recorded at or
+before t. ReplayClient serves one snapshot through the get_market interface,
+so run_dry_run and the sweep run against it unchanged and fully offline;
+backtest walks every recorded change in a time range and sizes bets at each.
+
+Usage:
+    python -m manifold.main --replay 2026-03-01T12:00     # dry run as of a past time
+    python -m manifold.main --backtest --since 2026-02-01 --until 2026-03-01
+    python -m manifold.snapshots --summary
+"""
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+from .config import DATA_DIR, TOTAL_BANKROLL
+
+
+SNAPSHOT_PATH = DATA_DIR / "snapshots.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    market_id TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_market_time ON snapshots (market_id, fetched_at);
+CREATE INDEX IF NOT EXISTS snapshots_time ON snapshots (fetched_at);
+"""
+
+
+def parse_time(value: str | None) -> float | None:
+    """Epoch seconds for an ISO date/time string (local time); None passes through."""
+    if value is None or value == "latest":
+        return None
+    return datetime.fromisoformat(value).timestamp()
+
+
+def _decode(blob: bytes) -> dict:
+    return json.loads(zlib.decompress(blob))
+
+
+class SnapshotStore:
+    """Timestamped, deduplicated market payloads in SQLite."""
+
+    def __init__(self, path: Path | str = SNAPSHOT_PATH):
+        self.path = path
+        if isinstance(path, Path):
+            path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        # Last digest per market, loaded once so recording needs no reads
+        self._digests = dict(self.conn.execute("""
+            SELECT market_id, digest FROM snapshots
+            WHERE id IN (SELECT MAX(id) FROM snapshots GROUP BY market_id)
+        """).fetchall())
+
+    def close(self):
+        self.conn.close()
+
+    def record(self, markets: dict[str, dict], fetched_at: float | None = None) -> int:
+        """Append market_id -> payload in one transaction, skipping unchanged payloads.
+
+        Returns the number of payloads stored.
+        """
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        rows = []
+        for market_id, payload in markets.items():
+            raw = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode()
+            digest = hashlib.blake2b(raw, digest_size=16).hexdigest()
+            if self._digests.get(market_id) == digest:
+                continue
+            self._digests[market_id] = digest
+            rows.append((fetched_at, market_id, digest, zlib.compress(raw)))
+        if rows:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO snapshots (fetched_at, market_id, digest, payload) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+        return len(rows)
+
+    def markets_at(self, at: float | None = None) -> dict[str, dict]:
+        """Snapshot as of `at` (default: latest): market_id -> payload."""
+        rows = self.conn.execute("""
+            SELECT market_id, payload FROM snapshots
+            WHERE id IN (SELECT MAX(id) FROM snapshots WHERE fetched_at <= ? GROUP BY market_id)
+        """, (float("inf") if at is None else at,)).fetchall()
+        return {market_id: _decode(blob) for market_id, blob in rows}
+
+    def iter_snapshots(
+        self,
+        since: float | None = None,
+        until: float | None = None,
+    ) -> Iterator[tuple[float, dict[str, dict]]]:
+        """Yield (fetched_at, snapshot) at `since` and after every later recorded change.
+
+        Only changed payloads are decoded; unchanged markets keep the same
+        dict object from one snapshot to the next, so callers can skip
+        reprocessing them with an identity check.
+        """
+        state = self.markets_at(since) if since is not None else {}
+        if state:
+            yield since, dict(state)
+        rows = self.conn.execute("""
+            SELECT fetched_at, market_id, payload FROM snapshots
+            WHERE fetched_at > ? AND fetched_at <= ? ORDER BY fetched_at, id
+        """, (float("-inf") if since is None else since, float("inf") if until is None else until))
+        current = None
+        for fetched_at, market_id, blob in rows:
+            if current is not None and fetched_at != current:
+                yield current, dict(state)
+            current = fetched_at
+            state[market_id] = _decode(blob)
+        if current is not None:
+            yield current, dict(state)
+
+    def summary(self) -> dict:
+        """Row count, market count, time range and stored bytes."""
+        n, markets, first, last, size = self.conn.execute("""
+            SELECT COUNT(*), COUNT(DISTINCT market_id), MIN(fetched_at), MAX(fetched_at),
+                   COALESCE(SUM(LENGTH(payload)), 0)
+            FROM snapshots
+        """).fetchone()
+        return {"payloads": n, "markets": markets, "first": first, "last": last, "bytes": size}
+
+
+class ReplayClient:
+    """Serves a stored snapshot through ManifoldClient.get_market."""
+
+    def __init__(self, markets: dict[str, dict]):
+        from .transport import LatencyHistogram
+
+        self.markets = markets
+        self.latency = LatencyHistogram()
+
+    def get_market(self, market_id: str, timeout: float | None = None) -> dict:
+        if market_id not in self.markets:
+            raise KeyError(f"market {market_id} is not in the snapshot")
+        return self.markets[market_id]
+
+
+def mark_to_market(market_results: dict[str, dict], bets, final_probs: dict[str, dict[str, float]]) -> float:
+    """P&L of BET_DTYPE bets if their shares were valued at final_probs.
+
+    Shares are what each bet would fill for along its answer's pool;
+    final_probs maps market_id -> answer_id -> probability. Bets on answers
+    missing from final_probs are left out.
+    """
+    import numpy as np
+
+    from .cpmm import fill
+
+    pnl = 0.0
+    for m, result in enumerate(market_results.values()):
+        rows = bets[bets["market"] == m]
+        probs = final_probs.get(result["market_id"])
+        if len(rows) == 0 or probs is None:
+            continue
+        buckets = rows["bucket"]
+        is_yes = rows["outcome"] == "YES"
+        shares, _, _ = fill(
+            result["pool_yes"][buckets], result["pool_no"][buckets],
+            rows["bet_amount"], is_yes, prob=rows["market_prob"],
+        )
+        final = np.array([probs.get(result["bucket_data"][b][0], np.nan) for b in buckets])
+        value = shares * np.where(is_yes, final, 1 - final)
+        known = np.isfinite(value)
+        pnl += float((value[known] - rows["bet_amount"][known]).sum())
+    return pnl
+
+
+def backtest(
+    store: SnapshotStore,
+    since: float | None = None,
+    until: float | None = None,
+    bankroll: float = TOTAL_BANKROLL,
+    sizing: str = "greedy",
+    slippage: bool = True,
+    predictions: dict | None = None,
+    market_ids: dict[str, str] | None = None,
+) -> list[dict]:
+    """Size bets at every recorded snapshot between since and until.
+
+    Each snapshot is sized from scratch with the full bankroll, exactly as a
+    dry run at that moment would have been, and scored by expected profit
+    and log growth under our distributions plus the mark-to-market P&L of
+    its bets at the last snapshot in the range. Only markets whose payload
+    changed are reprocessed between snapshots.
+    """
+    from .config import MARKET_IDS
+    from .kelly import allocate_bankroll
+    from .main import answer_probs, process_market, size_markets
+    from .predictions import PREDICTIONS
+    from .sweep import score_bets
+
+    predictions = PREDICTIONS if predictions is None else predictions
+    market_ids = MARKET_IDS if market_ids is None else market_ids
+    key_for = {mid: key for key, mid in market_ids.items() if key in predictions}
+
+    final_probs = {mid: answer_probs(m) for mid, m in store.markets_at(until).items()}
+    processed: dict[str, tuple[dict, dict | None]] = {}
+    rows = []
+    for at, markets in store.iter_snapshots(since, until):
+        for market_id, payload in markets.items():
+            key = key_for.get(market_id)
+            if key is None or (key in processed and processed[key][0] is payload):
+                continue
+            try:
+                result = process_market(payload, key, predictions[key], verbose=False, market_id=market_id)
+            except Exception as e:
+                print(f"  {datetime.fromtimestamp(at):%Y-%m-%d %H:%M} error processing {key}: {e}")
+                result = None
+            processed[key] = (payload, result)
+
+        results = {k: r for k, (_, r) in processed.items() if r is not None}
+        if not results:
+            continue
+        allocations = allocate_bankroll({k: r["market_edge"] for k, r in results.items()}, bankroll)
+        bets = size_markets(results, allocations, sizing=sizing, slippage=slippage)
+        growth, profit = score_bets(results, bets, bankroll)
+        rows.append({
+            "time": at,
+            "markets": len(results),
+            "n_bets": len(bets),
+            "total_stake": float(bets["bet_amount"].sum()),
+            "expected_profit": profit,
+            "expected_log_growth": growth,
+            "mtm_pnl": mark_to_market(results, bets, final_probs),
+        })
+    return rows
+
+
+def print_backtest(rows: list[dict]):
+    """Print one line per snapshot and the totals."""
+    print(f"  {'Snapshot':<16} {'Mkts':>4} {'Bets':>5} {'Stake':>8} {'E[profit]':>10} "
+          f"{'E[logG]':>8} {'MtM P&L':>9}")
+    for r in rows:
+        print(f"  {datetime.fromtimestamp(r['time']):%Y-%m-%d %H:%M} {r['markets']:>4} {r['n_bets']:>5} "
+              f"{r['total_stake']:>8.0f} {r['expected_profit']:>+10.1f} "
+              f"{r['expected_log_growth']:>+8.4f} {r['mtm_pnl']:>+9.1f}")
+    if rows:
+        stake = sum(r["total_stake"] for r in rows)
+        mtm = sum(r["mtm_pnl"] for r in rows)
+        print(f"  {len(rows)} snapshots, {stake:.0f} mana staked, mark-to-market P&L {mtm:+.1f}")
+    else:
+        print("  no snapshots in range")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the market snapshot store")
+    parser.add_argument("--snapshots", type=Path, default=SNAPSHOT_PATH)
+    parser.add_argument("--summary", action="store_true", help="Show what the store holds")
+    parser.add_argument("--list", action="store_true", help="List snapshot times")
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.snapshots)
+    if args.summary or not args.list:
+        s = store.summary()
+        if s["payloads"]:
+            print(f"  {s['payloads']} payloads for {s['markets']} markets, {s['bytes'] / 1e6:.1f} MB, "
+                  f"{datetime.fromtimestamp(s['first']):%Y-%m-%d %H:%M} to "
+                  f"{datetime.fromtimestamp(s['last']):%Y-%m-%d %H:%M}")
+        else:
+            print("  empty")
+    if args.list:
+        for at, n in store.conn.execute(
+            "SELECT fetched_at, COUNT(*) FROM snapshots GROUP BY fetched_at ORDER BY fetched_at"
+        ):
+            print(f"  {datetime.fromtimestamp(at):%Y-%m-%d %H:%M:%S}  {n} markets changed")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
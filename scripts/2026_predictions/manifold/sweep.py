@@ -0,0 +1,156 @@
+"""Parameter sweeps over a frozen market snapshot.
+
+main --sweep fetches and processes every market once, then sizes bets for
+each point of a (bankroll, kelly_fraction, edge_threshold, max_position_pct)
+grid on a process pool, with the same sizing code as a dry run. Nothing
+after the initial fetch touches the network.
+
+Each configuration is scored by its expected log growth under our
+distributions: the sum over markets of E[log(1 + P&L / bankroll)], with each
+bet paying out at the average price it would fill at along its answer's CPMM
+pool. Summing per market treats markets as independent small bets; the
+Monte Carlo simulator (manifold.simulate) gives the full joint picture.
+
+Usage:
+    python -m manifold.main --sweep --sweep-bankroll 5000 17619 --sweep-kelly 0.1 0.25 0.5
+"""
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from .cpmm import fill_price
+from .joint_kelly import expected_log_growth, outcome_wealth
+from .kelly import allocate_bankroll
+from .main import size_markets
+
+
+@dataclass
+class SweepConfig:
+    """One point of the sweep grid."""
+
+    bankroll: float
+    kelly_fraction: float
+    edge_threshold: float
+    max_position_pct: float
+
+
+def sweep_grid(
+    bankrolls: list[float],
+    kelly_fractions: list[float],
+    edge_thresholds: list[float],
+    max_position_pcts: list[float],
+) -> list[SweepConfig]:
+    """Cartesian product of the parameter lists."""
+    return [SweepConfig(*point) for point in itertools.product(
+        bankrolls, kelly_fractions, edge_thresholds, max_position_pcts,
+    )]
+
+
+def score_bets(
+    market_results: dict[str, dict],
+    bets: np.ndarray,
+    bankroll: float,
+) -> tuple[float, float]:
+    """Expected log growth and expected profit of a BET_DTYPE array of bets."""
+    growth = 0.0
+    profit = 0.0
+    for m, result in enumerate(market_results.values()):
+        rows = bets[bets["market"] == m]
+        if len(rows) == 0:
+            continue
+        buckets = rows["bucket"]
+        is_yes = rows["outcome"] == "YES"
+        price = fill_price(
+            result["pool_yes"][buckets], result["pool_no"][buckets],
+            rows["bet_amount"], is_yes, prob=rows["market_prob"],
+        )
+        # Effective YES price of each bucket we bet on, stakes per unit bankroll
+        prices = np.array(result["market_probs"], dtype=float)
+        prices[buckets] = np.where(is_yes, price, 1 - price)
+        yes = np.zeros(len(prices))
+        no = np.zeros(len(prices))
+        yes[buckets] = np.where(is_yes, rows["bet_amount"], 0.0) / bankroll
+        no[buckets] = np.where(is_yes, 0.0, rows["bet_amount"]) / bankroll
+
+        q = result["our_probs"]
+        growth += float(expected_log_growth(q, prices, yes, no))
+        profit += float((q * (outcome_wealth(prices, yes, no) - 1)).sum()) * bankroll
+
+    return growth, profit
+
+
+def evaluate_config(
+    market_results: dict[str, dict],
+    cfg: SweepConfig,
+    sizing: str = "greedy",
+    slippage: bool = True,
+) -> dict:
+    """Size bets for one configuration and score them."""
+    edges = {k: r["market_edge"] for k, r in market_results.items()}
+    allocations = allocate_bankroll(edges, cfg.bankroll)
+    bets = size_markets(
+        market_results, allocations, sizing=sizing, slippage=slippage,
+        kelly_mult=cfg.kelly_fraction, edge_threshold=cfg.edge_threshold,
+        max_position_pct=cfg.max_position_pct,
+    )
+
+    growth, profit = score_bets(market_results, bets, cfg.bankroll)
+    return {
+        **vars(cfg),
+        "n_bets": len(bets),
+        "total_stake": float(bets["bet_amount"].sum()),
+        "expected_profit": profit,
+        "expected_log_growth": growth,
+    }
+
+
+# Set once per worker process, so the snapshot is pickled once per worker
+_worker_state: tuple | None = None
+
+
+def _init_worker(market_results: dict[str, dict], sizing: str, slippage: bool):
+    global _worker_state
+    _worker_state = (market_results, sizing, slippage)
+
+
+def _evaluate_in_worker(cfg: SweepConfig) -> dict:
+    market_results, sizing, slippage = _worker_state
+    return evaluate_config(market_results, cfg, sizing, slippage)
+
+
+def run_sweep(
+    market_results: dict[str, dict],
+    configs: list[SweepConfig],
+    sizing: str = "greedy",
+    slippage: bool = True,
+    workers: int | None = None,
+    mp_context=None,
+) -> list[dict]:
+    """Evaluate every configuration against the frozen snapshot.
+
+    mp_context is passed to the process pool; callers running threads
+    (the daemon) pass a spawn/forkserver context rather than forking.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(configs))
+    if workers <= 1:
+        return [evaluate_config(market_results, cfg, sizing, slippage) for cfg in configs]
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=mp_context,
+        initializer=_init_worker, initargs=(market_results, sizing, slippage),
+    ) as pool:
+        chunksize = max(1, len(configs) // (workers * 4))
+        return list(pool.map(_evaluate_in_worker, configs, chunksize=chunksize))
+
+
+def print_sweep(results: list[dict]):
+    """Print the sweep as a table, best expected log growth first."""
+    print(f"  {'Bankroll':>8} {'Kelly':>5} {'Edge':>5} {'MaxPos':>6} {'Bets':>5} "
+          f"{'Stake':>8} {'E[profit]':>10} {'E[logG]':>8}")
+    for r in sorted(results, key=lambda r: -r["expected_log_growth"]):
+        print(f"  {r['bankroll']:>8.0f} {r['kelly_fraction']:>5.2f} {r['edge_threshold']:>5.2f} "
+              f"{r['max_position_pct']:>6.2f} {r['n_bets']:>5} {r['total_stake']:>8.0f} "
+              f"{r['expected_profit']:>+10.1f} {r['expected_log_growth']:>+8.4f}")
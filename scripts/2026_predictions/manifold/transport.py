@@ -0,0 +1,121 @@
+"""HTTP transport for the Manifold client: tuned session and latency histograms."""
+
+import bisect
+import threading
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+from .config import HTTP_POOL_SIZE, HTTP_MAX_RETRIES, HTTP_BACKOFF
+
+# Log-spaced latency buckets from 1ms to 100s, ~12% wide
+LATENCY_EDGES_MS = 10 ** np.arange(0, 5.01, 0.05)
+
+
+def make_session(
+    pool_size: int = HTTP_POOL_SIZE,
+    max_retries: int = HTTP_MAX_RETRIES,
+    backoff: float = HTTP_BACKOFF,
+) -> requests.Session:
+    """Build a keep-alive session with a sized pool, compression and retries.
+
+    GETs are retried with exponential backoff on connection errors, 429 and
+    5xx (honouring Retry-After). POSTs are only retried when the connection
+    could not be established, so a bet is never sent twice by the transport;
+    executor.call_with_retry decides whether a failed bet is safe to resend.
+    """
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        other=0,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry, pool_block=True)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # gzip/deflate always; br and zstd when brotli/zstandard are installed
+    session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+    return session
+
+
+class LatencyHistogram:
+    """Thread-safe per-endpoint histograms of request latency."""
+
+    def __init__(self, edges_ms: np.ndarray = LATENCY_EDGES_MS):
+        self.edges_ms = list(edges_ms)
+        self._lock = threading.Lock()
+        self.counts: dict[str, list[int]] = {}
+        self.totals: dict[str, float] = {}
+        self.maxima: dict[str, float] = {}
+        self.errors: dict[str, int] = {}
+
+    def record(self, endpoint: str, seconds: float, error: bool = False):
+        """Add one request's wall-clock latency."""
+        ms = seconds * 1000
+        i = bisect.bisect_left(self.edges_ms, ms)
+        with self._lock:
+            if endpoint not in self.counts:
+                self.counts[endpoint] = [0] * (len(self.edges_ms) + 1)
+                self.totals[endpoint] = 0.0
+                self.maxima[endpoint] = 0.0
+                self.errors[endpoint] = 0
+            self.counts[endpoint][i] += 1
+            self.totals[endpoint] += ms
+            self.maxima[endpoint] = max(self.maxima[endpoint], ms)
+            self.errors[endpoint] += error
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+            self.totals.clear()
+            self.maxima.clear()
+            self.errors.clear()
+
+    def quantile(self, endpoint: str, q: float) -> float:
+        """Approximate latency quantile in ms (geometric interpolation within a bucket)."""
+        counts = np.array(self.counts[endpoint])
+        cum = np.cumsum(counts)
+        target = q * cum[-1]
+        i = int(np.searchsorted(cum, target))
+        lo = self.edges_ms[i - 1] if i > 0 else self.edges_ms[0] / 10
+        hi = self.edges_ms[i] if i < len(self.edges_ms) else self.maxima[endpoint]
+        prev = cum[i - 1] if i > 0 else 0
+        frac = (target - prev) / counts[i] if counts[i] else 0.0
+        return min(lo * (hi / lo) ** frac, self.maxima[endpoint])
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Count, mean, p50/p95/p99 and max latency (ms) per endpoint."""
+        out = {}
+        for endpoint in sorted(self.counts):
+            n = sum(self.counts[endpoint])
+            out[endpoint] = {
+                "n": n,
+                "errors": self.errors[endpoint],
+                "mean": self.totals[endpoint] / n,
+                "p50": self.quantile(endpoint, 0.50),
+                "p95": self.quantile(endpoint, 0.95),
+                "p99": self.quantile(endpoint, 0.99),
+                "max": self.maxima[endpoint],
+            }
+        return out
+
+    def format(self) -> str:
+        """One line per endpoint, for printing."""
+        lines = []
+        for endpoint, s in self.summary().items():
+            lines.append(
+                f"  {endpoint:<24} n={s['n']:<5} p50={s['p50']:.1f}ms p95={s['p95']:.1f}ms "
+                f"p99={s['p99']:.1f}ms max={s['max']:.1f}ms"
+                + (f" errors={s['errors']}" if s["errors"] else "")
+            )
+        return "\n".join(lines) if lines else "  no requests"